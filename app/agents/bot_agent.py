@@ -3,22 +3,65 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.agents.agent_toolkits import create_retriever_tool
 from langchain.tools import Tool
-from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
+from langchain_core.retrievers import BaseRetriever
+from concurrent.futures import ThreadPoolExecutor
+from agents.callbacks import tracing_callbacks
+from utils.helper import child_config
+from utils.tracing import tracer
 import config as config
+import asyncio
+import contextvars
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
+# Bounded pool for blocking tool work (SQL, sync vector search) so it never runs on the event loop
+tool_executor = ThreadPoolExecutor(max_workers=config.TOOL_THREAD_POOL_SIZE, thread_name_prefix="bot-tool")
+
+async def run_blocking(func, *args):
+    """Run a blocking call in the shared tool thread pool."""
+    # Carry the current tracing span into the worker thread
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(tool_executor, context.run, func, *args)
+
+def annotate_span(**attributes):
+    """Attach attributes to the current tracing span, if there is one."""
+    span = tracer.current_span()
+    if span is not None:
+        span.set(**attributes)
+
+class PooledRetriever(BaseRetriever):
+    """Wrap a sync retriever so async callers run it in the tool thread pool."""
+
+    retriever: BaseRetriever
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.retriever.invoke(query, child_config(run_manager))
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        return await run_blocking(self.retriever.invoke, query, child_config(run_manager))
+
 class CollegeBotAgent:
-    def __init__(self, web_retriever, pdf_retriever, db_interface):
-        self.llm = ChatGoogleGenerativeAI(
+    # Reply the fast path uses when the retrieved context doesn't answer the question
+    NO_ANSWER = "NO_ANSWER"
+
+    def __init__(self, web_retriever, pdf_retriever, db_interface, router=None, llm=None, schema_index=None):
+        self.llm = llm or ChatGoogleGenerativeAI(
             model=config.LLM_MODEL,
             google_api_key=config.GOOGLE_API_KEY,
             temperature=0
         )
-        self.web_retriever = web_retriever
-        self.pdf_retriever = pdf_retriever
+        self.web_retriever = PooledRetriever(retriever=web_retriever)
+        self.pdf_retriever = PooledRetriever(retriever=pdf_retriever)
         self.db_interface = db_interface
+        self.router = router
+        # Picks the tables whose schema goes into the prompt for each question
+        self.schema_index = schema_index
+        # Spans for every LLM, tool and retriever run of a query
+        self.run_config = {"callbacks": [tracing_callbacks]}
+        
+        # Single-call prompt used when the router skips the agent
+        self.answer_prompt = self._create_answer_prompt()
         
         # Set up tools
         self.tools = self._create_tools()
@@ -41,14 +84,24 @@ class CollegeBotAgent:
         )
         
         def query_database(query):
-            """Execute SQL query on the college database."""
-            result = self.db_interface.query_database(query)
-            return str(result)  # Return as a message
+            """Execute a read-only SQL query on the college database."""
+            # Guarded mode caps rows and returns a compact table string; repeats come from the result cache
+            result = self.db_interface.query_database_cached(query)
+            if result.startswith("Error executing query") and self.schema_index is not None:
+                tables = self.schema_index.table_names()
+                if tables:
+                    result += f"\nAvailable tables: {', '.join(tables)}"
+            return result
+        
+        async def aquery_database(query):
+            """Execute SQL query without blocking the event loop."""
+            return await run_blocking(query_database, query)
         
         db_tool = Tool(
             name="database_query",
             func=query_database,
-            description="Run SQL queries against the college database. Use this for structured data like courses, faculty, events, etc."
+            coroutine=aquery_database,
+            description="Run a read-only SQL SELECT against the college database. Use this for structured data like courses, faculty, events, etc. Use only the tables and columns listed under Database tables. Results are capped, so filter or aggregate in SQL."
         )
         
         return [web_tool, pdf_tool, db_tool]
@@ -60,15 +113,29 @@ class CollegeBotAgent:
 
         {tools}
         
+        Database tables most relevant to this question:
+
+        {db_schema}
+
         Always try to provide accurate, helpful information based on the college's data.
         If you don't know something, say so rather than making up information.
+
+        Use the following format:
+
+        Thought: think about what to do next
+        Action: the action to take, one of [{tool_names}]
+        Action Input: the input to the action
+        Observation: the result of the action
+        ... (Thought/Action/Action Input/Observation can repeat)
+        Thought: I now know the final answer
+        Final Answer: the answer to the user's question
         """
         
+        # create_react_agent renders the scratchpad as text, so it goes in the human turn
         prompt = ChatPromptTemplate.from_messages([
             ("system", system_message),
             MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad")
+            ("human", "{input}\n\n{agent_scratchpad}")
         ])
         
         # Add tool_names to the prompt variables
@@ -83,63 +150,186 @@ class CollegeBotAgent:
         return AgentExecutor.from_agent_and_tools(
             agent=react_agent,
             tools=self.tools,
-            verbose=True,
+            verbose=False,
             max_iterations=5,
             handle_parsing_errors=True
         )
     
-    async def process_query(self, query, chat_history=None):
-        """Process a user query and return the response."""
-        if chat_history is None:
-            chat_history = []
-            
-        # Manually format agent_scratchpad
-        def _format_scratchpad(intermediate_steps):
-            """Ensure the scratchpad is always a list of BaseMessage objects."""
-            messages = []
-            for action, observation in intermediate_steps:
-                if hasattr(action, 'log'):
-                    messages.append(AIMessage(content=f"Action: {action.log}\nObservation: {observation}"))
-                messages.append(HumanMessage(content=f"Observation: {observation}"))
-            return messages
-        
-        # Get intermediate steps from previous execution (initially empty)
-        intermediate_steps = getattr(self.agent, 'intermediate_steps', [])  # Fallback to empty list
-        agent_scratchpad = _format_scratchpad(intermediate_steps)
-        
-        # **Fix: Ensure agent_scratchpad is a list of BaseMessage**
-        if not isinstance(agent_scratchpad, list) or any(not isinstance(msg, BaseMessage) for msg in agent_scratchpad):
-            logging.warning(f"agent_scratchpad was not a list of messages: {agent_scratchpad}")
-            agent_scratchpad = _format_scratchpad([])  # Reset to an empty list
+    def _create_answer_prompt(self):
+        """Create the prompt for answering directly from retrieved context."""
+        system_message = f"""You are an AI assistant for a college website.
+        Answer the question using only the context below, which was retrieved from the college's data.
+        If the context does not contain the answer, reply with exactly {self.NO_ANSWER}.
+
+        Context:
+        {{context}}
+        """
+        return ChatPromptTemplate.from_messages([
+            ("system", system_message),
+            MessagesPlaceholder(variable_name="chat_history"),
+            ("human", "{input}")
+        ])
+
+    async def summarize_conversation(self, summary, turns):
+        """Fold older exchanges (agents.memory.Turn) into a running conversation summary."""
+        conversation = "\n".join(f"User: {turn.question}\nAssistant: {turn.answer}" for turn in turns)
+        messages = [
+            ("system", f"""Update the running summary of a conversation between a user and a college assistant.
+        Keep names, programs, dates, numbers and open questions the user may refer back to; drop small talk.
+        Reply with the updated summary only, in at most {config.MEMORY_SUMMARY_WORDS} words."""),
+            ("human", f"Current summary:\n{summary or '(none)'}\n\nNew exchanges:\n{conversation}")
+        ]
+        return (await self.llm.ainvoke(messages, config=self.run_config)).content
+
+    async def _route_to_context(self, query, chat_history):
+        """Return answer-prompt messages if the router is confident, else None.
+
+        Both retrievers are queried concurrently; the routed source comes first
+        in the context.
+        """
+        if self.router is None:
+            return None
+        source, confidence = await self.router.route(query)
+        annotate_span(route=source, route_confidence=round(confidence, 3))
+        if source not in ("website", "pdfs") or confidence < config.ROUTER_CONFIDENCE:
+            return None
+        logging.info(f"Fast path: routed to {source} ({confidence:.2f})")
+
+        retrievers = [("website", self.web_retriever), ("pdfs", self.pdf_retriever)]
+        if source == "pdfs":
+            retrievers.reverse()
+        results = await asyncio.gather(
+            *(retriever.ainvoke(query, config=self.run_config) for _, retriever in retrievers),
+            return_exceptions=True
+        )
+        sections = []
+        for (name, _), docs in zip(retrievers, results):
+            if isinstance(docs, Exception):
+                logging.warning(f"{name} retriever failed: {docs}")
+                continue
+            sections.extend(f"[{name}: {doc.metadata.get('source', '')}]\n{doc.page_content}" for doc in docs)
+        if not sections:
+            return None
+        return self.answer_prompt.format_messages(
+            context="\n\n".join(sections),
+            chat_history=chat_history or [],
+            input=query
+        )
+
+    async def _schema_context(self, query):
+        """Schema of the tables relevant to query, for the database_query tool."""
+        if self.schema_index is None:
+            return "(not available)"
+        try:
+            docs = await self.schema_index.relevant_tables(query)
+        except Exception as e:
+            logging.warning(f"Couldn't load database schema: {e}")
+            docs = []
+        annotate_span(schema_tables=",".join(doc.metadata.get("table", "") for doc in docs))
+        return "\n\n".join(doc.page_content for doc in docs) or "(not available)"
+
+    async def _build_inputs(self, query, chat_history=None):
+        """Build the executor inputs for a query.
 
-        inputs = {
+        Everything here is per request: the executor builds the scratchpad from
+        the intermediate steps of this call only, so concurrent queries sharing
+        one agent never see each other's state.
+        """
+        return {
             "input": query,
-            "chat_history": chat_history,
-            "agent_scratchpad": [agent_scratchpad]
+            "chat_history": chat_history or [],
+            "db_schema": await self._schema_context(query)
         }
-        
-        logging.info(f"Agent inputs: {inputs}")
-        
-        try:
-            response = await self.agent.ainvoke(inputs)
-        except ValueError as e:
-            logging.error(f"ValueError in agent execution: {str(e)}")
-            logging.info(f"Agent inputs before error: {inputs}")
-            # Retry with empty scratchpad if error persists
-            agent_scratchpad = _format_scratchpad([])
-            inputs["agent_scratchpad"] = agent_scratchpad
-            response = await self.agent.ainvoke(inputs)
-        
-        logging.info(f"Agent response: {response}")
-        
-        # Ensure agent_scratchpad in response is a list
-        if "agent_scratchpad" in response and (not isinstance(response["agent_scratchpad"], list) or 
-                                               any(not isinstance(msg, BaseMessage) for msg in response["agent_scratchpad"])):
-            logging.warning(f"agent_scratchpad was not a list of messages: {response['agent_scratchpad']}")
-            response["agent_scratchpad"] = _format_scratchpad([])  # Reset it
-
-        # Update intermediate_steps for next call (if supported by your agent)
-        if hasattr(self.agent, 'intermediate_steps'):
-            self.agent.intermediate_steps = response.get('intermediate_steps', [])
-        
+
+    async def _fast_answer(self, messages):
+        """Answer from the routed context in one call; None if the context doesn't have the answer."""
+        answer = (await self.llm.ainvoke(messages, config=self.run_config)).content.strip()
+        # The model sometimes explains itself around the marker, so look for it anywhere
+        if self.NO_ANSWER in answer:
+            logging.info("Fast path had no answer, falling back to the agent")
+            return None
+        annotate_span(path="fast")
+        return answer
+
+    async def process_query(self, query, chat_history=None):
+        """Process a user query and return the response."""
+        messages = await self._route_to_context(query, chat_history)
+        if messages is not None:
+            answer = await self._fast_answer(messages)
+            if answer is not None:
+                return answer
+
+        annotate_span(path="agent")
+        inputs = await self._build_inputs(query, chat_history)
+        response = await self.agent.ainvoke(inputs, config=self.run_config)
         return response["output"]
+
+    async def stream_query(self, query, chat_history=None):
+        """Run a query and yield (event, data) pairs as the agent works.
+
+        Emits ``tool_start``/``tool_end`` when a tool runs, ``retrieval`` when a
+        retriever returns, ``token`` for each piece of the final answer as the
+        model produces it, and ``final`` with the complete answer. A fast-path
+        answer arrives as a single token: NO_ANSWER can appear anywhere in the
+        reply, so nothing is sent until the whole reply has been checked.
+        """
+        messages = await self._route_to_context(query, chat_history)
+        if messages is not None:
+            yield "route", {"path": "fast"}
+            answer = await self._fast_answer(messages)
+            if answer is not None:
+                if answer:
+                    yield "token", {"text": answer}
+                yield "final", {"response": answer}
+                return
+            yield "route", {"path": "agent"}
+
+        annotate_span(path="agent")
+        inputs = await self._build_inputs(query, chat_history)
+        # ReAct output only becomes the answer after this marker
+        marker = "Final Answer:"
+        buffers = {}
+        # run_id -> whether any answer text has been emitted for that LLM run
+        answer_runs = {}
+        # Retrievers nest (pooled -> hybrid -> dense); only the one a tool called is reported
+        tool_runs = set()
+        output = None
+
+        async for event in self.agent.astream_events(inputs, version="v2", config=self.run_config):
+            kind = event["event"]
+            data = event.get("data", {})
+
+            if kind == "on_chat_model_stream":
+                text = data["chunk"].content if isinstance(data["chunk"].content, str) else ""
+                run_id = event["run_id"]
+                if run_id not in answer_runs:
+                    buffers[run_id] = buffers.get(run_id, "") + text
+                    if marker not in buffers[run_id]:
+                        continue
+                    answer_runs[run_id] = False
+                    text = buffers.pop(run_id).split(marker, 1)[1]
+                if not answer_runs[run_id]:
+                    # Drop the whitespace between the marker and the answer
+                    text = text.lstrip()
+                if text:
+                    answer_runs[run_id] = True
+                    yield "token", {"text": text}
+            elif kind == "on_tool_start":
+                tool_runs.add(event["run_id"])
+                yield "tool_start", {"tool": event["name"]}
+            elif kind == "on_tool_end":
+                yield "tool_end", {"tool": event["name"]}
+            elif kind == "on_retriever_end" and event.get("parent_ids", [None])[-1] in tool_runs:
+                documents = data.get("output") or []
+                yield "retrieval", {"documents": len(documents)}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                result = data.get("output")
+                if isinstance(result, dict) and "output" in result:
+                    output = result["output"]
+
+        if output is None:
+            output = "Agent stopped without producing an answer."
+        if not answer_runs:
+            # The answer came from a fallback path rather than streamed tokens
+            yield "token", {"text": output}
+        yield "final", {"response": output}
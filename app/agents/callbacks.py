@@ -0,0 +1,88 @@
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+from utils.tracing import tracer
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turn LangChain LLM, tool and retriever runs into tracing spans.
+
+    Runs whose parent isn't traced (chains, the executor) hang off the span
+    that is current when they start, normally the request's query span.
+    Token usage is recorded on the LLM span and rolled up on the root span.
+    """
+
+    # Called directly on the event loop instead of via a thread pool: every hook is cheap
+    run_inline = True
+
+    def __init__(self):
+        self.spans = {}
+        self.lock = threading.Lock()
+
+    def _start(self, name, run_id, parent_run_id, **attributes):
+        if not tracer.enabled:
+            return
+        with self.lock:
+            parent = self.spans.get(parent_run_id)
+        span = tracer.start_span(name, parent=parent, **attributes)
+        with self.lock:
+            self.spans[run_id] = span
+
+    def _end(self, run_id, error=None, **attributes):
+        with self.lock:
+            span = self.spans.pop(run_id, None)
+        if span is not None:
+            span.set(**attributes)
+            tracer.end_span(span, error)
+        return span
+
+    @staticmethod
+    def _model_name(serialized, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        return params.get("model") or params.get("model_name") or (serialized or {}).get("name", "llm")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start("llm", run_id, parent_run_id, model=self._model_name(serialized, kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start("llm", run_id, parent_run_id, model=self._model_name(serialized, kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        span = self._end(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+        if span is None:
+            return
+        tracer.metrics.inc("collegebot_llm_tokens_total", input_tokens, direction="input")
+        tracer.metrics.inc("collegebot_llm_tokens_total", output_tokens, direction="output")
+        span.root.add("llm.calls", 1)
+        span.root.add("llm.input_tokens", input_tokens)
+        span.root.add("llm.output_tokens", output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start(f"tool.{(serialized or {}).get('name', 'unknown')}", run_id, parent_run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start("retriever", run_id, parent_run_id, retriever=kwargs.get("name") or "retriever")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+# Stateless apart from in-flight runs keyed by run_id, so one handler serves every request
+tracing_callbacks = TracingCallbackHandler()
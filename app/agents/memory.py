@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+import config as config
+
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), no tokenizer round trip."""
+    return len(text) // 4 + 1
+
+
+def _terms(text):
+    return {word for word in _WORD.findall(text.lower()) if len(word) > 2}
+
+
+class Turn:
+    """One question/answer exchange."""
+
+    __slots__ = ("question", "answer", "tokens", "turn_id")
+
+    def __init__(self, question, answer, turn_id=None):
+        self.question = question
+        self.answer = answer
+        self.tokens = estimate_tokens(question) + estimate_tokens(answer)
+        self.turn_id = turn_id or uuid.uuid4().hex
+
+    def to_messages(self):
+        return [HumanMessage(content=self.question), AIMessage(content=self.answer)]
+
+
+def turns_from_chat_history(chat_history):
+    """Pair client chat_history entries ({"role", "content"}) into exchanges."""
+    turns, question = [], None
+    for message in chat_history or []:
+        if message["role"] == "user":
+            if question is not None:
+                turns.append(Turn(question, ""))
+            question = message["content"]
+        else:
+            turns.append(Turn(question or "", message["content"]))
+            question = None
+    if question is not None:
+        turns.append(Turn(question, ""))
+    return turns
+
+
+def select_turns(turns, query, budget, recent_turns=config.MEMORY_RECENT_TURNS):
+    """Pick the exchanges worth sending with a query, within a token budget.
+
+    The newest recent_turns exchanges come first; older ones are added only
+    if they share words with the query, best match first. The result is in
+    conversation order.
+    """
+    chosen, used = set(), 0
+    for index in range(len(turns) - 1, max(len(turns) - recent_turns, 0) - 1, -1):
+        if used + turns[index].tokens > budget:
+            break
+        chosen.add(index)
+        used += turns[index].tokens
+
+    query_terms = _terms(query)
+    scored = [
+        (len(query_terms & _terms(f"{turns[index].question} {turns[index].answer}")), index)
+        for index in range(len(turns)) if index not in chosen
+    ]
+    for score, index in sorted(scored, reverse=True):
+        if score == 0:
+            break
+        if used + turns[index].tokens <= budget:
+            chosen.add(index)
+            used += turns[index].tokens
+    return [turns[index] for index in sorted(chosen)]
+
+
+class Session:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.summary = ""
+        self.turns = []
+        self.updated_at = time.monotonic()
+        self.compacting = False
+
+    @property
+    def turn_tokens(self):
+        return sum(turn.tokens for turn in self.turns)
+
+
+class SessionMemory:
+    """Server-side conversation history keyed by session ID.
+
+    Each session holds a rolling summary plus the exchanges not yet folded
+    into it. When those exchanges outgrow the token budget, everything but
+    the most recent ones is summarized in the background by summarizer, an
+    async callable (summary, turns) -> new summary. Prompts get the summary
+    and the exchanges select_turns picks, so their size stays under
+    token_budget however long the session runs. Sessions expire after ttl
+    seconds idle; the least recently used are evicted beyond max_sessions.
+
+    Sessions live in this process; MongoSessionMemory shares them between
+    API workers.
+    """
+
+    def __init__(
+        self,
+        summarizer=None,
+        token_budget=config.MEMORY_TOKEN_BUDGET,
+        recent_turns=config.MEMORY_RECENT_TURNS,
+        max_turns=config.MEMORY_MAX_TURNS,
+        ttl=config.MEMORY_SESSION_TTL,
+        max_sessions=config.MEMORY_MAX_SESSIONS,
+    ):
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.summaries = 0
+        self._tasks = set()
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def _session(self, session_id, create=True):
+        session = self.sessions.get(session_id)
+        now = time.monotonic()
+        if session is not None and now - session.updated_at > self.ttl:
+            del self.sessions[session_id]
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = self.sessions[session_id] = Session(session_id)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session_id)
+        session.updated_at = now
+        return session
+
+    async def _load(self, session_id):
+        """The session, or None if it doesn't exist or has expired."""
+        return self._session(session_id, create=False)
+
+    async def _add_turn(self, session_id, turn):
+        """Append an exchange, creating the session if needed, and return the session."""
+        session = self._session(session_id)
+        session.turns.append(turn)
+        # Hard cap in case summaries keep failing
+        del session.turns[:-self.max_turns]
+        return session
+
+    def _messages(self, summary, turns, query):
+        messages = []
+        if summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        budget = self.token_budget - (estimate_tokens(summary) if summary else 0)
+        for turn in select_turns(turns, query, budget, self.recent_turns):
+            messages.extend(turn.to_messages())
+        return messages
+
+    async def history(self, session_id, query):
+        """Chat-history messages to send with query, or None if the session doesn't exist or has expired."""
+        session = await self._load(session_id)
+        if session is None:
+            return None
+        return self._messages(session.summary, session.turns, query)
+
+    def compact(self, chat_history, query):
+        """Budget-trimmed messages for a client-supplied history (no session, no summary)."""
+        return self._messages("", turns_from_chat_history(chat_history), query)
+
+    async def append(self, session_id, question, answer):
+        """Record an answered exchange; may start a background summarization."""
+        session = await self._add_turn(session_id, Turn(question, answer))
+        self._maybe_compact(session)
+
+    def _maybe_compact(self, session):
+        if self.summarizer is None or session.compacting:
+            return
+        if session.turn_tokens <= self.token_budget or len(session.turns) <= self.recent_turns:
+            return
+        session.compacting = True
+        task = asyncio.create_task(self._compact(session))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, session):
+        """Fold all but the most recent exchanges into the session summary."""
+        folded = session.turns[:len(session.turns) - self.recent_turns]
+        try:
+            summary = await self.summarizer(session.summary, folded)
+        except Exception as e:
+            logging.warning(f"Couldn't summarize session {session.session_id}: {e}")
+            return
+        finally:
+            session.compacting = False
+        session.summary = summary.strip()
+        # Exchanges appended while the summary was being written stay unsummarized
+        folded_ids = {turn.turn_id for turn in folded}
+        session.turns = [turn for turn in session.turns if turn.turn_id not in folded_ids]
+        self.summaries += 1
+
+    def stats(self):
+        return {"sessions": len(self.sessions), "summaries": self.summaries}
+
+
+class MongoSessionMemory(SessionMemory):
+    """SessionMemory stored in a MongoDB collection, shared by every API worker.
+
+    One document per session holds its summary and unsummarized exchanges.
+    Exchanges are added with $push, so requests for one session served by
+    different workers never overwrite each other, and a new summary only
+    removes the exchanges it folded in. A compaction is claimed in the
+    document so only one worker summarizes a session at a time. Idle
+    sessions expire through a TTL index on updated_at.
+    """
+
+    # A claimed compaction that doesn't finish in this many seconds can be retried
+    compaction_timeout = 120
+
+    def __init__(self, collection, summarizer=None, **kwargs):
+        super().__init__(summarizer, **kwargs)
+        self.collection = collection
+        self._indexed = False
+
+    def _ensure_index(self):
+        # Created on first use so an unreachable server never delays startup
+        if not self._indexed:
+            self.collection.create_index("updated_at", expireAfterSeconds=self.ttl)
+            self._indexed = True
+
+    @staticmethod
+    def _to_session(doc):
+        session = Session(doc["_id"])
+        session.summary = doc.get("summary", "")
+        session.turns = [Turn(turn["question"], turn["answer"], turn["id"]) for turn in doc.get("turns", [])]
+        session.compacting = doc.get("compacting_until", 0) > time.time()
+        return session
+
+    def _find(self, session_id):
+        self._ensure_index()
+        now = datetime.now(timezone.utc)
+        # The TTL monitor only runs every minute, so don't rely on it for expiry
+        doc = self.collection.find_one_and_update(
+            {"_id": session_id, "updated_at": {"$gt": now - timedelta(seconds=self.ttl)}},
+            {"$set": {"updated_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._to_session(doc) if doc else None
+
+    def _push(self, session_id, turn):
+        self._ensure_index()
+        doc = self.collection.find_one_and_update(
+            {"_id": session_id},
+            {
+                "$push": {"turns": {
+                    "$each": [{"id": turn.turn_id, "question": turn.question, "answer": turn.answer}],
+                    # Hard cap in case summaries keep failing
+                    "$slice": -self.max_turns,
+                }},
+                "$set": {"updated_at": datetime.now(timezone.utc)},
+                "$setOnInsert": {"summary": ""},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return self._to_session(doc)
+
+    def _claim_compaction(self, session_id):
+        """Mark the session as being summarized here; None if another worker already is."""
+        now = time.time()
+        doc = self.collection.find_one_and_update(
+            {"_id": session_id, "$or": [
+                {"compacting_until": {"$exists": False}},
+                {"compacting_until": {"$lt": now}},
+            ]},
+            {"$set": {"compacting_until": now + self.compaction_timeout}},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._to_session(doc) if doc else None
+
+    def _finish_compaction(self, session_id, summary, folded):
+        update = {"$unset": {"compacting_until": ""}}
+        if summary is not None:
+            update["$set"] = {"summary": summary}
+            update["$pull"] = {"turns": {"id": {"$in": [turn.turn_id for turn in folded]}}}
+        self.collection.update_one({"_id": session_id}, update)
+
+    async def _load(self, session_id):
+        return await asyncio.to_thread(self._find, session_id)
+
+    async def _add_turn(self, session_id, turn):
+        return await asyncio.to_thread(self._push, session_id, turn)
+
+    async def _compact(self, session):
+        """Fold all but the most recent exchanges of the stored session into its summary."""
+        try:
+            # Summarize the stored session: another worker may have compacted it since
+            claimed = await asyncio.to_thread(self._claim_compaction, session.session_id)
+        except Exception as e:
+            logging.warning(f"Couldn't claim session {session.session_id} for summarizing: {e}")
+            return
+        if claimed is None:
+            return
+        folded = claimed.turns[:len(claimed.turns) - self.recent_turns]
+        summary = None
+        try:
+            if folded:
+                summary = (await self.summarizer(claimed.summary, folded)).strip()
+        except Exception as e:
+            logging.warning(f"Couldn't summarize session {session.session_id}: {e}")
+        try:
+            await asyncio.to_thread(self._finish_compaction, session.session_id, summary, folded)
+        except Exception as e:
+            logging.warning(f"Couldn't store the summary of session {session.session_id}: {e}")
+            return
+        if summary is not None:
+            self.summaries += 1
+
+    def stats(self):
+        # Counting stored sessions would be a database round trip on every /health call
+        return {"store": "mongodb", "summaries": self.summaries}
@@ -0,0 +1,95 @@
+import asyncio
+import re
+import numpy as np
+
+# Keyword rules: a hit votes for the source that usually holds the answer
+SOURCE_KEYWORDS = {
+    "website": [
+        "admission", "apply", "contact", "campus", "hostel", "placement", "news", "department",
+        "director", "location", "address", "about", "history", "ranking", "facilities", "club",
+    ],
+    "pdfs": [
+        "syllabus", "curriculum", "regulation", "handbook", "brochure", "credit", "scheme",
+        "notification", "advertisement", "recruitment", "elective", "course structure", "b.tech", "btech",
+    ],
+    "database": [
+        "how many", "list all", "count", "average", "total", "timetable", "schedule", "email of",
+        "phone number", "room", "office hours", "upcoming events", "which faculty", "top ",
+    ],
+}
+
+# Short descriptions whose embeddings act as per-source centroids
+SOURCE_DESCRIPTIONS = {
+    "website": [
+        "college admissions process, contact details, campus life and news",
+        "information about departments, placements, hostels and facilities",
+    ],
+    "pdfs": [
+        "course syllabus, curriculum, credits and academic regulations",
+        "official notifications, recruitment advertisements and brochures",
+    ],
+    "database": [
+        "structured records: counts, lists of courses, faculty, rooms and events",
+        "timetables, schedules and lookups of specific rows",
+    ],
+}
+
+
+class QueryRouter:
+    """Cheap classifier that picks the data source a question needs.
+
+    Combines keyword votes with cosine similarity to per-source centroid
+    embeddings. ``route`` returns (source, confidence) where confidence is the
+    probability mass on the chosen source.
+    """
+
+    def __init__(self, embeddings=None, temperature=0.05):
+        self.embeddings = embeddings
+        self.temperature = temperature
+        self.sources = list(SOURCE_KEYWORDS)
+        self.centroids = None
+        self.lock = asyncio.Lock()
+
+    def _keyword_scores(self, query):
+        text = query.lower()
+        votes = np.array([
+            sum(1 for keyword in SOURCE_KEYWORDS[source] if re.search(rf"\b{re.escape(keyword)}", text))
+            for source in self.sources
+        ], dtype=np.float32)
+        return votes / votes.sum() if votes.sum() else None
+
+    async def _load_centroids(self):
+        async with self.lock:
+            if self.centroids is None:
+                phrases = [phrase for source in self.sources for phrase in SOURCE_DESCRIPTIONS[source]]
+                vectors = np.asarray(await asyncio.to_thread(self.embeddings.embed_documents, phrases), dtype=np.float32)
+                centroids, offset = [], 0
+                for source in self.sources:
+                    count = len(SOURCE_DESCRIPTIONS[source])
+                    centroid = vectors[offset:offset + count].mean(axis=0)
+                    centroids.append(centroid / np.linalg.norm(centroid))
+                    offset += count
+                self.centroids = np.stack(centroids)
+        return self.centroids
+
+    async def _embedding_scores(self, query):
+        if self.embeddings is None:
+            return None
+        try:
+            centroids = await self._load_centroids()
+            vector = np.asarray(await asyncio.to_thread(self.embeddings.embed_query, query), dtype=np.float32)
+        except Exception as e:
+            print(f"Router embedding failed: {e}")
+            return None
+        similarities = centroids @ (vector / np.linalg.norm(vector))
+        weights = np.exp((similarities - similarities.max()) / self.temperature)
+        return weights / weights.sum()
+
+    async def route(self, query):
+        """Return (source, confidence) for a query."""
+        scores = [s for s in (self._keyword_scores(query), await self._embedding_scores(query)) if s is not None]
+        if not scores:
+            return None, 0.0
+        combined = np.mean(scores, axis=0)
+        best = int(np.argmax(combined))
+        return self.sources[best], float(combined[best])
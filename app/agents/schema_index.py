@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import re
+import numpy as np
+import config as config
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _terms(text):
+    words = set(_WORD.findall(text.lower()))
+    # Crude singular forms so "courses" matches "course" and "faculties" matches "faculty"
+    return words | {re.sub(r"(ies|s)$", lambda m: "y" if m.group(1) == "ies" else "", word) for word in words}
+
+
+class SchemaIndex:
+    """Embedding index over the database's per-table schema documents.
+
+    relevant_tables() picks the k tables most relevant to a question, so the agent
+    prompt carries their columns, keys and sample values instead of no
+    schema at all (or all of it). The index is built on first use and
+    rebuilt when the database loader's schema is refreshed. Without
+    embeddings, tables are ranked by word overlap with the question.
+    """
+
+    def __init__(self, db_interface, embeddings=None, k=config.SQL_SCHEMA_TOP_K):
+        self.db_interface = db_interface
+        self.embeddings = embeddings
+        self.k = k
+        self.docs = None
+        # Unit vectors, one row per schema document
+        self.vectors = None
+        self.lock = asyncio.Lock()
+
+    async def _load(self):
+        # get_schema_info returns the same list until the schema is refreshed
+        docs = await asyncio.to_thread(self.db_interface.get_schema_info)
+        if docs is self.docs:
+            return docs
+        async with self.lock:
+            if docs is not self.docs:
+                vectors = None
+                if self.embeddings is not None and docs:
+                    try:
+                        vectors = np.asarray(await asyncio.to_thread(
+                            self.embeddings.embed_documents, [doc.page_content for doc in docs]
+                        ), dtype=np.float32)
+                        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                    except Exception as e:
+                        logging.warning(f"Couldn't embed database schema, ranking tables by keywords: {e}")
+                        vectors = None
+                self.docs, self.vectors = docs, vectors
+        return docs
+
+    async def _scores(self, question, docs):
+        question_terms = _terms(question)
+        # A table named in the question always ranks first
+        scores = np.array([
+            float(bool(_terms(doc.metadata.get("table", "")) & question_terms)) for doc in docs
+        ], dtype=np.float32)
+        vectors = self.vectors
+        if vectors is not None:
+            try:
+                vector = np.asarray(await asyncio.to_thread(self.embeddings.embed_query, question), dtype=np.float32)
+                return scores + vectors @ (vector / np.linalg.norm(vector))
+            except Exception as e:
+                logging.warning(f"Couldn't embed question for schema lookup: {e}")
+        overlap = [len(question_terms & _terms(doc.page_content)) / (len(question_terms) or 1) for doc in docs]
+        return scores + np.array(overlap, dtype=np.float32)
+
+    async def relevant_tables(self, question):
+        """Schema documents of the k tables most relevant to question, best first."""
+        docs = await self._load()
+        if not docs or len(docs) <= self.k:
+            return list(docs or [])
+        scores = await self._scores(question, docs)
+        return [docs[index] for index in np.argsort(-scores, kind="stable")[:self.k]]
+
+    def table_names(self):
+        """Names of every table in the loaded schema."""
+        return [doc.metadata.get("table") for doc in self.docs or []]
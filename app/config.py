@@ -12,15 +12,123 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "embedding-001")
 
+# Embedding cache settings (set EMBEDDING_CACHE_PATH to "" to keep the cache in memory only)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+
 # College website settings
 WEBSITE_URL = os.getenv("WEBSITE_URL", "https://your-college-website.edu")
+USER_AGENT = os.getenv("USER_AGENT", "CollegeBot/1.0")
+
+# Crawler settings
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "50"))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "16"))
+CRAWL_PER_HOST_CONCURRENCY = int(os.getenv("CRAWL_PER_HOST_CONCURRENCY", "8"))
+CRAWL_RATE_LIMIT = float(os.getenv("CRAWL_RATE_LIMIT", "10"))  # requests/second per host, 0 = unlimited
+CRAWL_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", "30"))
 
 # Database settings
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///college_data.db")
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "50"))
+SQL_TIMEOUT = float(os.getenv("SQL_TIMEOUT", "10"))  # seconds
+SQL_MAX_CELL_CHARS = int(os.getenv("SQL_MAX_CELL_CHARS", "200"))
+# Only the SQL_SCHEMA_TOP_K tables most relevant to a question go into the agent prompt
+SQL_SCHEMA_TOP_K = int(os.getenv("SQL_SCHEMA_TOP_K", "3"))
+SQL_SCHEMA_SAMPLE_ROWS = int(os.getenv("SQL_SCHEMA_SAMPLE_ROWS", "3"))  # rows sampled for example values
+# Result cache for repeated SELECTs, invalidated when a table's row count or checksum changes
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
+SQL_CACHE_TTL = int(os.getenv("SQL_CACHE_TTL", "300"))
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "500"))
+SQL_CACHE_CHECK_INTERVAL = float(os.getenv("SQL_CACHE_CHECK_INTERVAL", "10"))  # seconds a table fingerprint is trusted
 
 # MongoDB Vector Store settings
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "college_bot")
 
+# Agent settings
+TOOL_THREAD_POOL_SIZE = int(os.getenv("TOOL_THREAD_POOL_SIZE", "16"))
+
+# Conversation memory: server-side sessions keyed by session_id. Prompts carry a rolling
+# summary plus the recent/relevant exchanges that fit in MEMORY_TOKEN_BUDGET tokens
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))  # newest exchanges always kept
+MEMORY_SUMMARY_WORDS = int(os.getenv("MEMORY_SUMMARY_WORDS", "200"))
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "50"))  # unsummarized exchanges kept per session
+MEMORY_SESSION_TTL = int(os.getenv("MEMORY_SESSION_TTL", "86400"))  # seconds idle before a session expires
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+# "memory" keeps sessions in the API process; "mongodb" shares them between API workers
+# (any deployment with more than one) and is the default with INDEX_RUNNER=worker
+MEMORY_BACKEND = os.getenv(
+    "MEMORY_BACKEND", "mongodb" if os.getenv("INDEX_RUNNER", "inline") == "worker" else "memory"
+)
+MEMORY_SESSION_COLLECTION = os.getenv("MEMORY_SESSION_COLLECTION", "sessions")
+
+# Query router settings: confident website/PDF questions skip the ReAct loop
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_CONFIDENCE = float(os.getenv("ROUTER_CONFIDENCE", "0.6"))
+
+# Response cache settings
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+# Tracing: spans go to /metrics (Prometheus text) and, if TRACE_EXPORT_PATH is set,
+# to an OTLP/JSON lines file written by a background thread
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))  # spans beyond this are dropped
+
+# Query log: "jsonl" (rotating gzip files), "mongodb" (a collection) or "none".
+# Entries are buffered in memory and written in batches by a background thread
+QUERY_LOG_SINK = os.getenv("QUERY_LOG_SINK", "jsonl")
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "./logs/queries.jsonl.gz")
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+QUERY_LOG_BACKUPS = int(os.getenv("QUERY_LOG_BACKUPS", "5"))
+QUERY_LOG_COLLECTION = os.getenv("QUERY_LOG_COLLECTION", "query_logs")
+QUERY_LOG_BUFFER_SIZE = int(os.getenv("QUERY_LOG_BUFFER_SIZE", "10000"))
+QUERY_LOG_BATCH_SIZE = int(os.getenv("QUERY_LOG_BATCH_SIZE", "200"))
+QUERY_LOG_FLUSH_INTERVAL = float(os.getenv("QUERY_LOG_FLUSH_INTERVAL", "2.0"))  # seconds
+# When the buffer is full: "drop" overwrites the oldest entry, "block" waits up to
+# QUERY_LOG_BLOCK_TIMEOUT seconds for the writer and then drops the new one
+QUERY_LOG_OVERFLOW = os.getenv("QUERY_LOG_OVERFLOW", "drop")
+QUERY_LOG_BLOCK_TIMEOUT = float(os.getenv("QUERY_LOG_BLOCK_TIMEOUT", "0.5"))
+
+# Vector backend: "mongodb" (Atlas $vectorSearch) or "local" (in-process NumPy index)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "mongodb")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "./local_index")
+LOCAL_INDEX_IVF_LISTS = int(os.getenv("LOCAL_INDEX_IVF_LISTS", "0"))  # 0 = exact search only
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+
+# Retrieval settings: HYBRID_RETRIEVAL fuses BM25 keyword hits with vector hits
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "4"))
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", "./keyword_index")
+
+# Indexing settings
+INDEX_MODE = os.getenv("INDEX_MODE", "incremental")  # "incremental", "streaming" or "full"
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "64"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+EMBEDDING_RETRY_BACKOFF = float(os.getenv("EMBEDDING_RETRY_BACKOFF", "1.0"))
+# Full/streaming rebuilds go into a new collection version that only goes live if it
+# holds every chunk and at least INDEX_MIN_COUNT_RATIO of the live version's documents
+INDEX_MIN_COUNT_RATIO = float(os.getenv("INDEX_MIN_COUNT_RATIO", "0.5"))
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "1"))  # old versions kept for rollback
+INDEX_GC_DELAY = int(os.getenv("INDEX_GC_DELAY", "300"))  # seconds before old versions are dropped
+INDEX_READY_TIMEOUT = int(os.getenv("INDEX_READY_TIMEOUT", "120"))  # wait for Atlas search index
+# Where /index runs: "inline" (in the API process) or "worker" (queued in MongoDB and run by
+# worker.py). In worker mode every API worker polls the published index version and rebuilds
+# its retrievers when it changes; KEYWORD_INDEX_DIR (and LOCAL_INDEX_DIR) must be shared storage
+INDEX_RUNNER = os.getenv("INDEX_RUNNER", "inline")
+INDEX_JOBS_COLLECTION = os.getenv("INDEX_JOBS_COLLECTION", "index_jobs")
+INDEX_VERSION_POLL_INTERVAL = float(os.getenv("INDEX_VERSION_POLL_INTERVAL", "5"))  # seconds, API workers
+INDEX_JOB_POLL_INTERVAL = float(os.getenv("INDEX_JOB_POLL_INTERVAL", "2"))  # seconds, indexing worker
+INDEX_JOB_STALE_AFTER = int(os.getenv("INDEX_JOB_STALE_AFTER", "600"))  # seconds without a heartbeat before a job is retried
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))  # estimated Jaccard similarity
+
 # PDF directory
-PDF_DIRECTORY = os.getenv("PDF_DIRECTORY", "./pdfs")
\ No newline at end of file
+PDF_DIRECTORY = os.getenv("PDF_DIRECTORY", "./pdfs")
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
\ No newline at end of file
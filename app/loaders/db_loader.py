@@ -1,10 +1,223 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from sqlalchemy import create_engine, MetaData, inspect, text
 from langchain.docstore.document import Document
 import config as config
 import pymysql
 
+# Statements the guarded query mode will run
+READ_ONLY_STATEMENTS = ("select", "with", "show", "describe", "desc", "explain")
+# Statements that write or change session state. They only count where a statement
+# can start, so columns named load, set, ... are fine
+WRITE_STATEMENTS = frozenset({
+    "insert", "update", "delete", "drop", "alter", "create", "truncate", "replace", "grant", "revoke",
+    "merge", "call", "lock", "unlock", "rename", "load", "handler", "set", "do", "prepare", "execute",
+})
+# The ones that can follow a parenthesis: WITH x AS (DELETE ...) or WITH x AS (...) UPDATE ...
+NESTED_WRITE_STATEMENTS = frozenset({"insert", "update", "delete", "replace", "merge"})
+# Words between EXPLAIN/DESCRIBE and the statement it explains
+EXPLAIN_OPTIONS = frozenset({
+    "analyze", "analyse", "verbose", "extended", "partitions", "format", "json", "tree", "traditional",
+    "query", "plan", "costs", "buffers", "timing", "summary", "settings", "wal", "generic_plan",
+    "true", "false", "on", "off", "=", "(", ")", ",",
+})
+# Row locks taken by a SELECT: FOR UPDATE, FOR SHARE, FOR NO KEY UPDATE, FOR KEY SHARE
+LOCKING_CLAUSES = frozenset({"update", "share", "no", "key"})
+
+# One token per match: skipped whitespace/comments, an opaque quoted string or
+# identifier, a word, or a single other character. MySQL runs the body of /*! */
+# comments, so those are tokenized like the rest of the statement
+SQL_TOKENS = re.compile(
+    r"(?P<skip>\s+|--[^\n]*|#[^\n]*|/\*(?!!).*?\*/)"
+    r"|(?P<quoted>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`(?:[^`]|``)*`)"
+    r"|(?P<word>[a-z_][a-z0-9_$]*)"
+    r"|(?P<other>.)",
+    re.DOTALL | re.IGNORECASE
+)
+
+# String literals (kept verbatim) or comments (dropped) when normalizing SQL
+SQL_LITERALS_AND_COMMENTS = re.compile(
+    r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")|--[^\n]*|#[^\n]*|/\*.*?\*/", re.DOTALL
+)
+# Results of these change without any table changing, so they are never cached
+NON_DETERMINISTIC = re.compile(
+    r"\b(now|rand|random|uuid|sysdate|curdate|curtime|current_date|current_time|current_timestamp|"
+    r"localtime|localtimestamp|utc_date|utc_time|utc_timestamp|unix_timestamp|last_insert_id|connection_id)\b"
+)
+
+def normalize_sql(query):
+    """Canonical form of a statement for cache keys.
+
+    Comments are dropped, whitespace collapsed and everything outside string
+    literals lowercased, so trivially different spellings share one entry.
+    """
+    parts = SQL_LITERALS_AND_COMMENTS.split(query)
+    # split() puts the literal (or None for a comment) at every odd index
+    normalized = "".join(
+        (part or " ") if index % 2 else re.sub(r"\s+", " ", part.lower())
+        for index, part in enumerate(parts)
+    )
+    return re.sub(r"\s+", " ", normalized).strip().rstrip(";").strip()
+
+def sql_tokens(query):
+    """Split SQL into (kind, text) tokens; words are lowercased and comments dropped.
+
+    Keywords inside string literals and quoted identifiers never become
+    "word" tokens, and a -- inside a literal doesn't start a comment.
+    """
+    return [
+        (match.lastgroup, match.group().lower() if match.lastgroup == "word" else match.group())
+        for match in SQL_TOKENS.finditer(query)
+        if match.lastgroup != "skip"
+    ]
+
+@lru_cache(maxsize=1024)
+def read_only_violation(query):
+    """Why query isn't a single read-only statement, or None if it is.
+
+    Write statements are looked for where a statement can start: after
+    an EXPLAIN/DESCRIBE prefix and next to a parenthesis (data-modifying
+    CTEs). SELECT ... INTO and locking reads are rejected anywhere.
+    Memoized, since the agent and the result cache check the same queries.
+    """
+    statements = [[]]
+    for token in sql_tokens(query):
+        if token == ("other", ";"):
+            statements.append([])
+        else:
+            statements[-1].append(token)
+    statements = [tokens for tokens in statements if tokens]
+    if len(statements) != 1:
+        return "exactly one SQL statement is allowed"
+    tokens = statements[0]
+    if tokens[0][0] != "word" or tokens[0][1] not in READ_ONLY_STATEMENTS:
+        return "only read-only statements (SELECT, SHOW, DESCRIBE, EXPLAIN) are allowed"
+
+    explained = None
+    if tokens[0][1] in ("explain", "describe", "desc"):
+        explained = 1
+        while explained < len(tokens) and tokens[explained][1] in EXPLAIN_OPTIONS:
+            explained += 1
+
+    for index, (kind, word) in enumerate(tokens):
+        if kind != "word":
+            continue
+        following = tokens[index + 1] if index + 1 < len(tokens) else (None, None)
+        # A statement keyword is followed by a name; a column or alias of the same name isn't
+        starts_statement = following[0] in ("word", "quoted")
+        if index == explained and word in WRITE_STATEMENTS and starts_statement:
+            return f"'{word}' is not allowed in a read-only query"
+        if (
+            word in NESTED_WRITE_STATEMENTS and starts_statement
+            and index > 0 and tokens[index - 1][1] in ("(", ")")
+        ):
+            return f"'{word}' is not allowed in a read-only query"
+        if word == "into":
+            return "SELECT ... INTO is not allowed in a read-only query"
+        if (word, following[1]) == ("lock", "in") or (word == "for" and following[1] in LOCKING_CLAUSES):
+            return f"'{word} {following[1]}' is not allowed in a read-only query"
+    return None
+
+def format_rows(columns, rows, truncated=False, max_cell_chars=config.SQL_MAX_CELL_CHARS):
+    """Serialize rows as a compact pipe-separated table for the LLM."""
+    def cell(value):
+        value = "NULL" if value is None else str(value).replace("\n", " ")
+        return value if len(value) <= max_cell_chars else value[:max_cell_chars] + "..."
+
+    lines = [" | ".join(columns)]
+    lines.extend(" | ".join(cell(value) for value in row) for row in rows)
+    if truncated:
+        lines.append(f"(showing the first {len(rows)} rows; add filters or a LIMIT to narrow the result)")
+    return "\n".join(lines)
+
+class QueryResultCache:
+    """TTL + LRU cache of query results keyed by normalized SQL.
+
+    Each entry remembers the fingerprints (row count, plus CHECKSUM TABLE on
+    MySQL) of the tables its query read and is only served while they are
+    unchanged. A table's fingerprint is trusted for check_interval seconds,
+    so repeated lookups within that window never touch the database.
+    """
+
+    def __init__(
+        self,
+        fingerprint_tables,
+        ttl=config.SQL_CACHE_TTL,
+        max_entries=config.SQL_CACHE_MAX_ENTRIES,
+        check_interval=config.SQL_CACHE_CHECK_INTERVAL,
+    ):
+        # Callable: list of table names -> {table: fingerprint}
+        self.fingerprint_tables = fingerprint_tables
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        # key -> (result, {table: fingerprint}, expiry time)
+        self.entries = OrderedDict()
+        # table -> (fingerprint, time it was read)
+        self.fingerprints = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def fingerprint(self, tables):
+        """Current fingerprints of tables, re-reading those older than check_interval."""
+        now = time.monotonic()
+        with self.lock:
+            stale = [
+                table for table in tables
+                if table not in self.fingerprints or now - self.fingerprints[table][1] > self.check_interval
+            ]
+        if stale:
+            fresh = self.fingerprint_tables(stale)
+            with self.lock:
+                for table, value in fresh.items():
+                    self.fingerprints[table] = (value, now)
+        with self.lock:
+            return {table: self.fingerprints[table][0] for table in tables}
+
+    def get(self, key, fingerprint):
+        """Return the cached result for key if it is fresh and its tables are unchanged, else None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                result, entry_fingerprint, expires_at = entry
+                if expires_at > time.time() and entry_fingerprint == fingerprint:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self.entries[key]
+                if entry_fingerprint != fingerprint:
+                    self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key, fingerprint, result):
+        """Cache result, tagged with the fingerprint read before the query ran."""
+        with self.lock:
+            self.entries[key] = (result, fingerprint, time.time() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.fingerprints.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
 class CollegeDatabaseLoader:
-    def __init__(self, db_url=config.DATABASE_URL):
+    def __init__(self, db_url=config.DATABASE_URL, cache_results=config.SQL_CACHE_ENABLED):
         # Create engine with appropriate settings for MySQL
         self.engine = create_engine(
             db_url, 
@@ -12,25 +225,86 @@ class CollegeDatabaseLoader:
             pool_pre_ping=True  # Verify connections before using
         )
         self.metadata = MetaData()
-        self.inspector = inspect(self.engine)
+        # inspect() opens a connection, so it waits until schema is first needed
+        self._inspector = None
+        self._schema_cache = None
+        self.result_cache = QueryResultCache(self.table_fingerprints) if cache_results else None
+
+    @property
+    def inspector(self):
+        if self._inspector is None:
+            self._inspector = inspect(self.engine)
+        return self._inspector
         
     def get_tables(self):
         """Get all table names from the database."""
         return self.inspector.get_table_names()
     
-    def get_schema_info(self):
-        """Get schema information for all tables."""
+    def _quote(self, name):
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def _describe_table(self, conn, table, sample_rows):
+        """Schema document text for one table: columns, keys, row count and sample values."""
+        columns = self.inspector.get_columns(table)
+        primary_key = set(self.inspector.get_pk_constraint(table).get("constrained_columns") or [])
+        column_info = [
+            f"{col['name']} ({col['type']}{', primary key' if col['name'] in primary_key else ''})"
+            for col in columns
+        ]
+        lines = [f"Table: {table}", f"Columns: {', '.join(column_info)}"]
+
+        foreign_keys = [
+            f"{', '.join(fk['constrained_columns'])} -> {fk['referred_table']}.{', '.join(fk['referred_columns'])}"
+            for fk in self.inspector.get_foreign_keys(table)
+        ]
+        if foreign_keys:
+            lines.append(f"Foreign keys: {'; '.join(foreign_keys)}")
+
+        row_count = conn.execute(text(f"SELECT COUNT(*) FROM {self._quote(table)}")).scalar()
+        lines[0] += f" ({row_count} rows)"
+        if sample_rows and row_count:
+            result = conn.execute(text(f"SELECT * FROM {self._quote(table)} LIMIT {int(sample_rows)}"))
+            names, rows = list(result.keys()), result.fetchall()
+            samples = []
+            for index, name in enumerate(names):
+                values = list(dict.fromkeys(str(row[index])[:40] for row in rows if row[index] is not None))
+                if values:
+                    samples.append(f"{name}: {', '.join(values)}")
+            if samples:
+                lines.append(f"Sample values: {'; '.join(samples)}")
+        return "\n".join(lines)
+
+    def get_schema_info(self, refresh=False, sample_rows=config.SQL_SCHEMA_SAMPLE_ROWS):
+        """Get one schema Document per table, cached after the first call.
+
+        Each document lists the table's columns with types, its primary and
+        foreign keys, row count and a few sample values, which is what an LLM
+        needs to write a correct query first time.
+        """
+        if self._schema_cache is not None and not refresh:
+            return self._schema_cache
+
         tables = self.get_tables()
         schema_docs = []
-        
-        for table in tables:
-            columns = self.inspector.get_columns(table)
-            column_info = [f"{col['name']} ({col['type']})" for col in columns]
-            
-            content = f"Table: {table}\nColumns: {', '.join(column_info)}"
-            schema_docs.append(Document(page_content=content, metadata={"source": f"db_schema_{table}"}))
-        
+
+        with self.engine.connect() as conn:
+            for table in tables:
+                content = self._describe_table(conn, table, sample_rows)
+                schema_docs.append(Document(
+                    page_content=content, metadata={"source": f"db_schema_{table}", "table": table}
+                ))
+            conn.rollback()
+
+        self._schema_cache = schema_docs
         return schema_docs
+
+    def refresh_schema(self):
+        """Drop cached schema (e.g. after a migration) and rebuild it."""
+        # The inspector keeps its own reflection cache, so start a fresh one
+        self._inspector = None
+        if self.result_cache is not None:
+            self.result_cache.clear()
+        return self.get_schema_info(refresh=True)
     
     def query_database(self, query):
         """Execute SQL query and return results."""
@@ -49,7 +323,114 @@ class CollegeDatabaseLoader:
                 
         except Exception as e:
             return f"Error executing query: {e}"
+
+    @staticmethod
+    def check_read_only(query):
+        """Raise ValueError unless query is a single read-only statement."""
+        error = read_only_violation(query)
+        if error:
+            raise ValueError(error)
+
+    def _set_timeout(self, conn, timeout):
+        """Apply a per-query execution timeout for the current dialect."""
+        dialect = self.engine.dialect.name
+        if dialect == "mysql":
+            conn.execute(text(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout * 1000)}"))
+        elif dialect == "postgresql":
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+        elif dialect == "sqlite":
+            deadline = time.monotonic() + timeout
+            # A non-zero return from the handler aborts the running statement
+            conn.connection.driver_connection.set_progress_handler(
+                lambda: int(time.monotonic() > deadline), 10000
+            )
+
+    def _clear_timeout(self, conn):
+        dialect = self.engine.dialect.name
+        if dialect == "mysql":
+            conn.execute(text("SET SESSION MAX_EXECUTION_TIME = 0"))
+        elif dialect == "sqlite":
+            conn.connection.driver_connection.set_progress_handler(None, 0)
+
+    def query_database_guarded(self, query, max_rows=config.SQL_MAX_ROWS, timeout=config.SQL_TIMEOUT):
+        """Execute a read-only query with a row cap and timeout, returning a compact table.
+
+        Rows are streamed with fetchmany so at most max_rows + 1 are ever held
+        in memory, and the transaction is always rolled back.
+        """
+        try:
+            self.check_read_only(query)
+        except ValueError as e:
+            return f"Query rejected: {e}"
+
+        try:
+            with self.engine.connect() as conn:
+                self._set_timeout(conn, timeout)
+                try:
+                    result = conn.execution_options(stream_results=True).execute(text(query))
+                    if not result.returns_rows:
+                        return "Query executed successfully. No results returned."
+                    columns = list(result.keys())
+                    rows = result.fetchmany(max_rows + 1)
+                    result.close()
+                finally:
+                    conn.rollback()
+                    self._clear_timeout(conn)
+        except Exception as e:
+            return f"Error executing query: {e}"
+
+        if not rows:
+            return "Query executed successfully. No results returned."
+        return format_rows(columns, rows[:max_rows], truncated=len(rows) > max_rows)
     
+    def table_fingerprints(self, tables):
+        """Cheap change detectors for tables: (row count, checksum), the checksum on MySQL only."""
+        fingerprints = {}
+        with self.engine.connect() as conn:
+            for table in tables:
+                count = conn.execute(text(f"SELECT COUNT(*) FROM {self._quote(table)}")).scalar()
+                checksum = None
+                if self.engine.dialect.name == "mysql":
+                    checksum = conn.execute(text(f"CHECKSUM TABLE {self._quote(table)}")).fetchone()[1]
+                fingerprints[table] = (count, checksum)
+            conn.rollback()
+        return fingerprints
+
+    def _cache_key(self, query):
+        """(normalized SQL, tables it reads) for a cacheable query, else (None, None)."""
+        try:
+            self.check_read_only(query)
+        except ValueError:
+            return None, None
+        key = normalize_sql(query)
+        if key.split(" ", 1)[0] not in ("select", "with") or NON_DETERMINISTIC.search(key):
+            return None, None
+        # Without a table to watch there is nothing that could invalidate the entry
+        tables = [table for table in self.get_tables() if re.search(rf"\b{re.escape(table.lower())}\b", key)]
+        return (key, tables) if tables else (None, None)
+
+    def query_database_cached(self, query, max_rows=config.SQL_MAX_ROWS, timeout=config.SQL_TIMEOUT):
+        """query_database_guarded, served from the result cache when the same SELECT ran recently."""
+        if self.result_cache is None:
+            return self.query_database_guarded(query, max_rows, timeout)
+        try:
+            key, tables = self._cache_key(query)
+            # Read before running the query, so a concurrent write invalidates the entry
+            fingerprint = self.result_cache.fingerprint(tables) if key else None
+        except Exception:
+            key = None
+        if key is None:
+            return self.query_database_guarded(query, max_rows, timeout)
+
+        # Different row caps give different results
+        key = f"{max_rows}:{key}"
+        result = self.result_cache.get(key, fingerprint)
+        if result is None:
+            result = self.query_database_guarded(query, max_rows, timeout)
+            if not result.startswith(("Error executing query", "Query rejected")):
+                self.result_cache.set(key, fingerprint, result)
+        return result
+
     def test_connection(self):
         """Test if the database connection is working."""
         try:
@@ -57,4 +438,4 @@ class CollegeDatabaseLoader:
                 conn.execute(text("SELECT 1"))
                 return True
         except Exception as e:
-            return f"Connection error: {e}"
\ No newline at end of file
+            return f"Connection error: {e}"
@@ -1,16 +1,36 @@
+import json
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import config as config 
 
+
+def _extract_pdf(pdf_file, chunk_size, chunk_overlap):
+    """Parse and chunk a single PDF. Runs inside a worker process."""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    return text_splitter.split_documents(PyPDFLoader(pdf_file).load())
+
+
 class CollegePDFLoader:
-    def __init__(self, pdf_dir=config.PDF_DIRECTORY):
+    def __init__(self, pdf_dir=config.PDF_DIRECTORY, manifest_path=None):
         self.pdf_dir = pdf_dir
+        self.manifest_path = manifest_path or os.path.join(pdf_dir, ".manifest.json")
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap
         )
+        # Files whose indexed chunks the last parallel load keeps: skipped because they
+        # hadn't changed, or failed to parse
+        self.unchanged_files = []
+        self._pending_manifest = None
         
     def load_pdfs(self):
         """Load all PDFs from the specified directory."""
@@ -30,4 +50,77 @@ class CollegePDFLoader:
             except Exception as e:
                 print(f"Failed to load {pdf_file}: {e}")
         
-        return self.text_splitter.split_documents(documents)
\ No newline at end of file
+        return self.text_splitter.split_documents(documents)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def commit_manifest(self):
+        """Record the files from the last parallel load as indexed.
+
+        Call this only after their chunks were stored, so a failed run is
+        re-parsed next time instead of being skipped.
+        """
+        if self._pending_manifest is None:
+            return
+        with open(self.manifest_path, "w") as f:
+            json.dump(self._pending_manifest, f, indent=2)
+        self._pending_manifest = None
+
+    def load_pdfs_parallel(self, max_workers=config.PDF_WORKERS, skip_unchanged=False):
+        """Parse and chunk PDFs in a process pool, streaming chunks back as files finish.
+
+        With skip_unchanged, files whose mtime and size match the manifest are
+        not parsed and are listed in ``self.unchanged_files`` instead. Files
+        that fail to parse are added to it as the generator runs, so their
+        previously indexed chunks survive until a parse succeeds. The
+        directory scan happens immediately; parsing starts when the returned
+        generator is consumed.
+        """
+        if not os.path.exists(self.pdf_dir):
+            os.makedirs(self.pdf_dir)
+            print(f"Created PDF directory at {self.pdf_dir}")
+            self.unchanged_files = []
+            return iter(())
+
+        manifest = self._load_manifest() if skip_unchanged else {}
+        signatures = {}
+        to_parse = []
+        self.unchanged_files = []
+        for pdf_file in sorted(glob(os.path.join(self.pdf_dir, "*.pdf"))):
+            stat = os.stat(pdf_file)
+            signatures[pdf_file] = {"mtime": stat.st_mtime, "size": stat.st_size}
+            if manifest.get(pdf_file) == signatures[pdf_file]:
+                self.unchanged_files.append(pdf_file)
+            else:
+                to_parse.append(pdf_file)
+        print(f"Parsing {len(to_parse)} PDFs, skipping {len(self.unchanged_files)} unchanged")
+
+        def generate():
+            if to_parse:
+                # Spawn rather than fork: we're called from a threaded server process
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+                    futures = {
+                        pool.submit(_extract_pdf, pdf_file, self.chunk_size, self.chunk_overlap): pdf_file
+                        for pdf_file in to_parse
+                    }
+                    for future in as_completed(futures):
+                        pdf_file = futures[future]
+                        try:
+                            chunks = future.result()
+                        except Exception as e:
+                            print(f"Failed to load {pdf_file}: {e}")
+                            # Leave it out of the manifest so it is retried next run, and keep
+                            # its old chunks in the meantime
+                            signatures.pop(pdf_file, None)
+                            self.unchanged_files.append(pdf_file)
+                            continue
+                        yield from chunks
+            self._pending_manifest = signatures
+
+        return generate()
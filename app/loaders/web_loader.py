@@ -1,60 +1,215 @@
+import asyncio
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
-from langchain_community.document_loaders import WebBaseLoader
+from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from typing import List
-import config as config 
+import config as config
+
+# Links with these extensions are never HTML pages, so don't spend a request on them
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js",
+    ".zip", ".rar", ".gz", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".mp3", ".mp4",
+)
+
+# Query parameters that never change page content: any utm_* plus these exact names
+TRACKING_PREFIX = "utm_"
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "sessionid", "phpsessid", "sid"})
+
+
+def _is_tracking_param(key):
+    key = key.lower()
+    return key.startswith(TRACKING_PREFIX) or key in TRACKING_PARAMS
+
+
+def normalize_url(url, base=None):
+    """Resolve a link against base and reduce it to a canonical form for dedupe."""
+    if base:
+        url = urljoin(base, url)
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme, parts.port) in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    # Drop tracking parameters and sort the rest so equivalent queries compare equal
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    ))
+    # Drop the fragment: it never changes what the server returns
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class HostThrottle:
+    """Politeness limits for one host: max parallel requests and min delay between them."""
+
+    def __init__(self, max_concurrency, rate_limit):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.interval = 1.0 / rate_limit if rate_limit else 0.0
+        self.next_slot = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            # Reserve the next free slot before sleeping so waiters queue up in order
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
 
 class CollegeWebsiteLoader:
     def __init__(self, base_url=config.WEBSITE_URL):
         self.base_url = base_url
+        self.base_host = urlsplit(normalize_url(base_url)).netloc
         self.visited_urls = set()
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200
         )
-        
+
+    def _extract_links(self, soup, page_url):
+        """Return normalized same-domain links found in a parsed page."""
+        links = []
+        for link in soup.find_all('a', href=True):
+            href = link['href'].strip()
+            if href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+                continue
+            full_url = normalize_url(href, page_url)
+            parts = urlsplit(full_url)
+            if parts.scheme not in ('http', 'https') or parts.netloc != self.base_host:
+                continue
+            if parts.path.lower().endswith(SKIPPED_EXTENSIONS):
+                continue
+            links.append(full_url)
+        return links
+
+    @staticmethod
+    def _build_document(soup, url):
+        """Build a Document the same way WebBaseLoader does."""
+        metadata = {"source": url}
+        if title := soup.find("title"):
+            metadata["title"] = title.get_text()
+        if description := soup.find("meta", attrs={"name": "description"}):
+            metadata["description"] = description.get("content", "No description found.")
+        if html := soup.find("html"):
+            metadata["language"] = html.get("lang", "No language found.")
+        return Document(page_content=soup.get_text(), metadata=metadata)
+
     def get_all_links(self, url):
         """Extract all links from a webpage that belong to the same domain."""
         if url in self.visited_urls:
             return []
-        
+
         self.visited_urls.add(url)
         try:
             response = requests.get(url)
             soup = BeautifulSoup(response.text, 'html.parser')
-            links = []
-            
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if href.startswith('/'):
-                    full_url = f"{self.base_url}{href}"
-                    if full_url not in self.visited_urls:
-                        links.append(full_url)
-                elif href.startswith(self.base_url):
-                    if href not in self.visited_urls:
-                        links.append(href)
-            
-            return links
+            return [link for link in self._extract_links(soup, url) if link not in self.visited_urls]
         except Exception as e:
             print(f"Error fetching {url}: {e}")
             return []
-    
+
     def crawl_website(self, max_pages=50):
         """Crawl the website starting from the base URL."""
-        pages_to_visit = [self.base_url]
+        # langchain_community is slow to import and only this legacy path needs it
+        from langchain_community.document_loaders import WebBaseLoader
+
+        pages_to_visit = deque([self.base_url])
         documents = []
-        
+
         while pages_to_visit and len(self.visited_urls) < max_pages:
-            url = pages_to_visit.pop(0)
+            url = pages_to_visit.popleft()
             try:
                 loader = WebBaseLoader(url)
                 page_docs = loader.load()
                 documents.extend(page_docs)
-                
+
                 new_links = self.get_all_links(url)
                 pages_to_visit.extend(new_links)
             except Exception as e:
                 print(f"Failed to load {url}: {e}")
-        
-        return self.text_splitter.split_documents(documents)
\ No newline at end of file
+
+        return self.text_splitter.split_documents(documents)
+
+    async def _fetch_page(self, session, url, throttle):
+        """Download a page once and return (document, links), or None if it isn't usable HTML."""
+        try:
+            async with throttle:
+                async with session.get(url) as response:
+                    if response.status >= 400:
+                        print(f"Failed to load {url}: HTTP {response.status}")
+                        return None
+                    if "html" not in response.headers.get("Content-Type", "text/html"):
+                        return None
+                    final_url = normalize_url(str(response.url))
+                    html = await response.text(errors="replace")
+        except Exception as e:
+            print(f"Failed to load {url}: {e}")
+            return None
+
+        soup = BeautifulSoup(html, 'html.parser')
+        return self._build_document(soup, final_url), self._extract_links(soup, final_url)
+
+    async def crawl_website_async(
+        self,
+        max_pages=config.CRAWL_MAX_PAGES,
+        concurrency=config.CRAWL_CONCURRENCY,
+        per_host_concurrency=config.CRAWL_PER_HOST_CONCURRENCY,
+        rate_limit=config.CRAWL_RATE_LIMIT,
+    ):
+        """Crawl the website concurrently over a pooled HTTP session.
+
+        Each page is fetched and parsed once; the same response provides both the
+        document text and the outgoing links. ``rate_limit`` is requests per second
+        per host (0 disables it).
+        """
+        start_url = normalize_url(self.base_url)
+        frontier = deque([start_url])
+        seen = {start_url}
+        throttles = {}
+        documents = []
+        in_flight = set()
+
+        connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host_concurrency)
+        timeout = aiohttp.ClientTimeout(total=config.CRAWL_TIMEOUT)
+        headers = {"User-Agent": config.USER_AGENT}
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < concurrency:
+                    url = frontier.popleft()
+                    host = urlsplit(url).netloc
+                    if host not in throttles:
+                        throttles[host] = HostThrottle(per_host_concurrency, rate_limit)
+                    in_flight.add(asyncio.create_task(self._fetch_page(session, url, throttles[host])))
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page = task.result()
+                    if page is None:
+                        continue
+                    document, links = page
+                    # Redirects can land on a URL we haven't recorded yet
+                    seen.add(document.metadata["source"])
+                    documents.append(document)
+                    for link in links:
+                        if link not in seen and len(seen) < max_pages:
+                            seen.add(link)
+                            frontier.append(link)
+
+        self.visited_urls.update(seen)
+        return self.text_splitter.split_documents(documents)
@@ -1,20 +1,227 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import os
+import asyncio
+import time
 import config as config 
-from loaders.web_loader import CollegeWebsiteLoader
-from loaders.pdf_loader import CollegePDFLoader
-from loaders.db_loader import CollegeDatabaseLoader
-from vector_stores.mongodb_store import MongoDBVectorStore
-from agents.bot_agent import CollegeBotAgent
-from utils.helper import format_response, log_query
-from langchain_core.messages import AIMessage, HumanMessage
+from vector_stores.ingestion import IndexingProgress, build_indexes
+from utils.helper import format_response, format_sse, log_query
+from utils.lazy import LazyComponent
+from utils.tracing import configure_logging, metrics, tracer
 
+# Loaders, stores and the agent stack pull in LangChain, Gemini, pymongo,
+# SQLAlchemy and the PDF/HTML parsers, and some open connections when built.
+# They are imported and constructed on first use (or by the startup warm-up)
+# so importing this module stays cheap and the port binds right away.
 
+def _build_web_loader():
+    from loaders.web_loader import CollegeWebsiteLoader
+    return CollegeWebsiteLoader()
 
-app = FastAPI(title="College GenAI Bot API")
+def _build_pdf_loader():
+    from loaders.pdf_loader import CollegePDFLoader
+    return CollegePDFLoader()
+
+def _build_db_loader():
+    from loaders.db_loader import CollegeDatabaseLoader
+    return CollegeDatabaseLoader()
+
+def _build_vector_store():
+    if config.VECTOR_BACKEND == "local":
+        from vector_stores.local_store import LocalVectorStore
+        return LocalVectorStore()
+    from vector_stores.mongodb_store import MongoDBVectorStore
+    return MongoDBVectorStore()
+
+def _build_query_router():
+    if not config.ROUTER_ENABLED:
+        return None
+    from agents.router import QueryRouter
+    return QueryRouter(vector_store.get().embeddings)
+
+def _build_response_cache():
+    if not config.RESPONSE_CACHE_ENABLED:
+        return None
+    from utils.response_cache import SemanticResponseCache
+    return SemanticResponseCache(vector_store.get().embeddings)
+
+def _build_index_jobs():
+    if config.INDEX_RUNNER != "worker":
+        return None
+    from pymongo import MongoClient
+    from utils.index_jobs import IndexJobQueue
+    return IndexJobQueue(MongoClient(config.MONGODB_URI)[config.MONGODB_DB_NAME])
+
+def _build_query_log():
+    if config.QUERY_LOG_SINK == "none":
+        return None
+    from utils.query_log import JsonlQueryLogWriter, MongoQueryLogWriter, QueryLogSink
+    if config.QUERY_LOG_SINK == "mongodb":
+        from pymongo import MongoClient
+        client = MongoClient(config.MONGODB_URI)
+        writer = MongoQueryLogWriter(client[config.MONGODB_DB_NAME][config.QUERY_LOG_COLLECTION])
+    else:
+        writer = JsonlQueryLogWriter(config.QUERY_LOG_PATH)
+    return QueryLogSink(writer)
+
+# Initialize data loaders
+web_loader = LazyComponent("web_loader", _build_web_loader)
+pdf_loader = LazyComponent("pdf_loader", _build_pdf_loader)
+db_loader = LazyComponent("db_loader", _build_db_loader)
+
+# Initialize vector store
+vector_store = LazyComponent("vector_store", _build_vector_store)
+
+# Picks a data source so simple questions can skip the ReAct loop
+query_router = LazyComponent("query_router", _build_query_router)
+
+# Answers to history-free queries, cleared on every re-index
+response_cache = LazyComponent("response_cache", _build_response_cache)
+
+async def summarize_conversation(summary, turns):
+    return await current_agent().summarize_conversation(summary, turns)
+
+def _build_session_memory():
+    if config.MEMORY_BACKEND == "mongodb":
+        from pymongo import MongoClient
+        from agents.memory import MongoSessionMemory
+        client = MongoClient(config.MONGODB_URI)
+        return MongoSessionMemory(
+            client[config.MONGODB_DB_NAME][config.MEMORY_SESSION_COLLECTION],
+            summarizer=summarize_conversation
+        )
+    from agents.memory import SessionMemory
+    return SessionMemory(summarizer=summarize_conversation)
+
+# Conversation history per session_id, compacted into rolling summaries
+session_memory = LazyComponent("session_memory", _build_session_memory)
+
+# Buffered analytics log of every answered query
+query_log = LazyComponent("query_log", _build_query_log)
+
+# Job queue and published index version shared with worker.py (INDEX_RUNNER=worker only)
+index_jobs = LazyComponent("index_jobs", _build_index_jobs)
+
+# Built during warm-up, in this order
+STARTUP_COMPONENTS = (vector_store, db_loader, query_router, response_cache, session_memory, query_log, index_jobs)
+
+# Global agent reference
+college_bot_agent = None
+
+# Set once the startup warm-up has finished, successfully or not
+startup_state = {"done": False, "error": None, "seconds": None}
+
+# Progress of the most recent indexing run
+indexing_progress = IndexingProgress()
+
+# Published index version this process's agent was built from (INDEX_RUNNER=worker only)
+index_state = {"version": None}
+
+# Only one indexing run at a time; old index versions are dropped in the background
+indexing_lock = asyncio.Lock()
+background_jobs = set()
+
+def build_agent():
+    """Build an agent over the current indexes (blocking; imports the agent stack on first use)."""
+    from agents.bot_agent import CollegeBotAgent
+    from agents.schema_index import SchemaIndex
+    store = vector_store.get()
+    db = db_loader.get()
+    web_retriever = store.get_retriever("website")
+    pdf_retriever = store.get_retriever("pdfs")
+    return CollegeBotAgent(
+        web_retriever, pdf_retriever, db,
+        router=query_router.get(),
+        schema_index=SchemaIndex(db, store.embeddings)
+    )
+
+async def reload_agent():
+    """Build an agent over the current indexes and make it the live one.
+
+    The new agent is built fully before it is published; requests already
+    running keep the agent they started with, new ones get the new indexes.
+    """
+    new_agent = await asyncio.to_thread(build_agent)
+    global college_bot_agent
+    college_bot_agent = new_agent
+    # Cached answers may be stale now
+    cache = response_cache.peek()
+    if cache:
+        cache.clear()
+
+async def watch_index_version():
+    """Switch to new indexes whenever the indexing worker publishes a version."""
+    jobs = await index_jobs.aget()
+    while True:
+        await asyncio.sleep(config.INDEX_VERSION_POLL_INTERVAL)
+        if not startup_state["done"]:
+            continue
+        try:
+            version = await asyncio.to_thread(jobs.current_version)
+            if version == index_state["version"]:
+                continue
+            # Keyword indexes (and local vector indexes) are cached per process
+            (await vector_store.aget()).reload()
+            await reload_agent()
+            index_state["version"] = version
+            print(f"Switched to index version {version}")
+        except Exception as e:
+            print(f"Couldn't switch to the latest index version: {e}")
+
+async def startup_event():
+    """Build shared clients off the event loop, then initialize the agent if collections exist."""
+    start = time.perf_counter()
+    try:
+        for component in STARTUP_COMPONENTS:
+            await component.aget()
+    except Exception as e:
+        print(f"Startup failed: {e}")
+        startup_state["error"] = str(e)
+    else:
+        try:
+            jobs = index_jobs.peek()
+            if jobs is not None:
+                # Read first, so a version published while the agent builds is picked up later
+                index_state["version"] = await asyncio.to_thread(jobs.current_version)
+            store = vector_store.get()
+            if not any([await asyncio.to_thread(store.has_index, name) for name in ("website", "pdfs")]):
+                # An agent over empty indexes would answer every query with nothing
+                print("No indexed data yet, run the indexing process first")
+            else:
+                global college_bot_agent
+                college_bot_agent = await asyncio.to_thread(build_agent)
+                print("Bot agent initialized successfully")
+        except Exception as e:
+            print(f"Couldn't initialize agent: {e}")
+            print("You may need to run the indexing process first")
+    startup_state["seconds"] = round(time.perf_counter() - start, 3)
+    startup_state["done"] = True
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background: the server accepts connections (and /health
+    # answers) immediately, and /ready reports when queries can be served
+    log_listener = configure_logging()
+    warmup = asyncio.create_task(startup_event())
+    watcher = asyncio.create_task(watch_index_version()) if config.INDEX_RUNNER == "worker" else None
+    yield
+    if not warmup.done():
+        warmup.cancel()
+    if watcher:
+        watcher.cancel()
+    # Flush query logs, spans and log records still queued for the background writers
+    sink = query_log.peek()
+    if sink:
+        await asyncio.to_thread(sink.close)
+    tracer.shutdown()
+    if log_listener:
+        log_listener.stop()
+
+app = FastAPI(title="College GenAI Bot API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -25,105 +232,281 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize data loaders
-web_loader = CollegeWebsiteLoader()
-pdf_loader = CollegePDFLoader()
-db_loader = CollegeDatabaseLoader()
-
-# Initialize vector store
-vector_store = MongoDBVectorStore()
-
-# Global agent reference
-college_bot_agent = None
-
 class Query(BaseModel):
     text: str
+    # Server-side conversation memory; omit it on the first turn to start a new session
+    session_id: Optional[str] = None
+    # Stateless alternative to session_id: the client sends the whole conversation
     chat_history: Optional[List[dict]] = None
 
 class IndexingStatus(BaseModel):
     status: str
     message: str
+    # Set when the job was queued for the indexing worker; poll /index/jobs/{job_id}
+    job_id: Optional[str] = None
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the agent on startup if collections exist."""
-    try:
-        web_retriever = vector_store.load_vector_store("website").as_retriever()
-        pdf_retriever = vector_store.load_vector_store("pdfs").as_retriever()
-        
-        global college_bot_agent
-        college_bot_agent = CollegeBotAgent(web_retriever, pdf_retriever, db_loader)
-        print("Bot agent initialized successfully")
-    except Exception as e:
-        print(f"Couldn't initialize agent: {e}")
-        print("You may need to run the indexing process first")
+async def collect_old_index_versions():
+    """Drop superseded index versions once in-flight queries on them have finished."""
+    await asyncio.sleep(config.INDEX_GC_DELAY)
+    for collection_name in ("website", "pdfs"):
+        try:
+            await asyncio.to_thread(vector_store.get().garbage_collect, collection_name)
+        except Exception as e:
+            print(f"Couldn't garbage-collect '{collection_name}' versions: {e}")
 
 async def index_data_task():
     """Background task to index website and PDF data."""
-    # Load and index website content
-    print("Starting website crawling...")
-    web_docs = web_loader.crawl_website()
-    print(f"Crawled {len(web_docs)} website documents")
-    
-    web_vectordb = vector_store.create_from_documents(web_docs, "website")
-    print("Website content indexed successfully")
-    
-    # Load and index PDF content
-    print("Starting PDF indexing...")
-    pdf_docs = pdf_loader.load_pdfs()
-    print(f"Loaded {len(pdf_docs)} PDF documents")
-    
-    pdf_vectordb = vector_store.create_from_documents(pdf_docs, "pdfs")
-    print("PDF content indexed successfully")
-    
-    # Get retrievers
-    web_retriever = web_vectordb.as_retriever()
-    pdf_retriever = pdf_vectordb.as_retriever()
-    
-    # Initialize the agent
-    global college_bot_agent
-    college_bot_agent = CollegeBotAgent(web_retriever, pdf_retriever, db_loader)
-    print("Bot agent initialized with new data")
+    if indexing_lock.locked():
+        print("Indexing already running, skipping")
+        return
+    async with indexing_lock:
+        await _index_data()
+
+async def _index_data():
+    """Rebuild both indexes, then switch the agent over to them in one step."""
+    indexing_progress.start()
+    try:
+        crawler, pdf_reader, store = await asyncio.gather(
+            web_loader.aget(), pdf_loader.aget(), vector_store.aget()
+        )
+
+        await build_indexes(crawler, pdf_reader, store, indexing_progress)
+
+        await reload_agent()
+        print("Bot agent initialized with new data")
+
+        job = asyncio.create_task(collect_old_index_versions())
+        background_jobs.add(job)
+        job.add_done_callback(background_jobs.discard)
+        indexing_progress.finish()
+    except Exception as e:
+        print(f"Indexing failed: {e}")
+        indexing_progress.finish("failed", str(e))
 
 @app.post("/index", response_model=IndexingStatus)
 async def index_data(background_tasks: BackgroundTasks):
     """Endpoint to trigger data indexing."""
+    jobs = await index_jobs.aget()
+    if jobs is not None:
+        # Indexing runs in worker.py; this process only queues the job
+        job_id = await asyncio.to_thread(jobs.enqueue)
+        return {"status": "queued", "message": "Indexing job queued for the indexing worker", "job_id": job_id}
+    if indexing_progress.status == "processing":
+        return {"status": "processing", "message": "Data indexing is already running"}
     background_tasks.add_task(index_data_task)
     return {"status": "processing", "message": "Data indexing started in the background"}
 
+@app.get("/index/status")
+async def index_status():
+    """Progress and throughput of the most recent indexing run."""
+    jobs = await index_jobs.aget()
+    if jobs is not None:
+        job = await asyncio.to_thread(jobs.latest)
+        return jobs.as_dict(job) if job else {"status": "idle"}
+    return indexing_progress.as_dict()
+
+@app.get("/index/jobs/{job_id}")
+async def index_job_status(job_id: str):
+    """Status and progress of a job queued by /index when INDEX_RUNNER=worker."""
+    jobs = await index_jobs.aget()
+    job = await asyncio.to_thread(jobs.get, job_id) if jobs is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown indexing job")
+    return jobs.as_dict(job)
+
+def current_agent():
+    """Return the live agent, or fail the request if there isn't one yet."""
+    agent = college_bot_agent
+    if agent is None:
+        if not startup_state["done"]:
+            raise HTTPException(status_code=503, detail="Bot is starting up. Please retry shortly.")
+        raise HTTPException(status_code=400, detail="Bot not initialized. Please index data first.")
+    return agent
+
+def cache_generation_now():
+    """Response cache generation; reload_agent() starts a new one after swapping the agent."""
+    cache = response_cache.peek()
+    return cache.generation if cache else None
+
+async def record_query(query, response, endpoint, started, span, session_id=None, cached=False):
+    """Queue the analytics entry for an answered query; the write happens in the background."""
+    entry = log_query(
+        query.text,
+        response,
+        query.chat_history,
+        endpoint=endpoint,
+        session_id=session_id,
+        cached=cached,
+        latency_ms=round((time.perf_counter() - started) * 1000, 1),
+        trace_id=span.trace_id
+    )
+    sink = await query_log.aget()
+    if sink is not None:
+        await sink.asubmit(entry)
+
+async def conversation_history(memory, query):
+    """Return (session_id, chat-history messages) for a query.
+
+    Clients sending nothing start a server-side session and get its
+    session_id back; it is stored with the first answered exchange. Clients
+    sending only chat_history get it trimmed to the memory token budget.
+    A session_id the server doesn't know, or whose session expired, is
+    rejected with 404 rather than started under the client's ID.
+    """
+    if query.session_id is None:
+        if query.chat_history:
+            return None, memory.compact(query.chat_history, query.text)
+        return memory.new_session_id(), []
+    history = await memory.history(query.session_id, query.text)
+    if history is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Session not found or expired. Omit session_id to start a new session."
+        )
+    return query.session_id, history
+
 @app.post("/query")
 async def query_bot(query: Query):
     """Endpoint to query the GenAI bot."""
-    global college_bot_agent
-    
-    if college_bot_agent is None:
-        raise HTTPException(status_code=400, detail="Bot not initialized. Please index data first.")
+    started = time.perf_counter()
+    # Read before taking the agent, so an answer from an agent a re-index replaced is never cached
+    cache_generation = cache_generation_now()
+    # Take one reference so a re-index swapping the agent can't change it mid-request
+    agent = current_agent()
     
     # Format chat history for agent
-    formatted_history = []
-    if query.chat_history:
-        for message in query.chat_history:
-            if message["role"] == "user":
-                formatted_history.append(HumanMessage(content=message["content"]))
-            else:
-                formatted_history.append(AIMessage(content=message["content"]))
+    memory = await session_memory.aget()
+    session_id, formatted_history = await conversation_history(memory, query)
     
-    # Process the query
-    response = await college_bot_agent.process_query(query.text, formatted_history)
+    with tracer.span("query", endpoint="/query", history_messages=len(formatted_history)) as span:
+        # Only history-free queries are cacheable: with history the answer depends on context
+        cache = await response_cache.aget()
+        use_cache = cache is not None and not formatted_history
+        if use_cache:
+            cached = await cache.get(query.text)
+            span.set(response_cache_hit=cached is not None)
+            if cached is not None:
+                metrics.inc("collegebot_queries_total", endpoint="/query", cached="true")
+                if session_id:
+                    await memory.append(session_id, query.text, cached)
+                await record_query(query, cached, "/query", started, span, session_id, cached=True)
+                return {"response": cached, "session_id": session_id, "cached": True}
+
+        # Process the query
+        response = await agent.process_query(query.text, formatted_history)
+
+        if use_cache:
+            await cache.set(query.text, response, cache_generation)
     
+    metrics.inc("collegebot_queries_total", endpoint="/query", cached="false")
+    if session_id:
+        await memory.append(session_id, query.text, response)
     # Log the interaction
-    log_query(query.text, response, query.chat_history)
+    await record_query(query, response, "/query", started, span, session_id)
     
-    return {"response": response}
+    return {"response": response, "session_id": session_id}
+
+@app.post("/query/stream")
+async def query_bot_stream(query: Query):
+    """Streaming variant of /query that sends Server-Sent Events as the agent works."""
+    started = time.perf_counter()
+    cache_generation = cache_generation_now()
+    agent = current_agent()
+
+    memory = await session_memory.aget()
+    session_id, formatted_history = await conversation_history(memory, query)
+    cache = await response_cache.aget()
+    use_cache = cache is not None and not formatted_history
+
+    async def event_stream():
+        with tracer.span("query", endpoint="/query/stream", history_messages=len(formatted_history)) as span:
+            if use_cache:
+                cached = await cache.get(query.text)
+                span.set(response_cache_hit=cached is not None)
+                if cached is not None:
+                    yield format_sse("token", {"text": cached})
+                    yield format_sse("final", {"response": cached, "session_id": session_id, "cached": True})
+                    metrics.inc("collegebot_queries_total", endpoint="/query/stream", cached="true")
+                    if session_id:
+                        await memory.append(session_id, query.text, cached)
+                    await record_query(query, cached, "/query/stream", started, span, session_id, cached=True)
+                    return
+
+            response = None
+            try:
+                async for event, data in agent.stream_query(query.text, formatted_history):
+                    if event == "final":
+                        response = data["response"]
+                        data = {**data, "session_id": session_id}
+                    yield format_sse(event, data)
+            except Exception as e:
+                span.set(error=str(e))
+                yield format_sse("error", {"detail": str(e)})
+                return
+
+            if use_cache:
+                await cache.set(query.text, response, cache_generation)
+        metrics.inc("collegebot_queries_total", endpoint="/query/stream", cached="false")
+        if session_id:
+            await memory.append(session_id, query.text, response)
+        await record_query(query, response, "/query/stream", started, span, session_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Liveness check. Reports what has been built so far and never builds anything itself."""
+    store = vector_store.peek()
+    cache = response_cache.peek()
+    sink = query_log.peek()
+    memory = session_memory.peek()
+    db = db_loader.peek()
     return {
         "status": "healthy",
         "bot_initialized": college_bot_agent is not None,
-        "mongodb_connected": True if vector_store.client else False
+        "vector_backend": config.VECTOR_BACKEND,
+        "index_runner": config.INDEX_RUNNER,
+        "index_version": index_state["version"],
+        "mongodb_connected": True if store is not None and store.client else False,
+        "embedding_cache": store.embeddings.stats() if store is not None else None,
+        "response_cache": cache.stats() if cache else None,
+        "session_memory": memory.stats() if memory else None,
+        "sql_cache": db.result_cache.stats() if db is not None and db.result_cache else None,
+        "query_log": sink.stats() if sink else None
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Span latencies, token and cache counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 200 once warm-up has finished and the agent can answer queries."""
+    ready = startup_state["done"] and college_bot_agent is not None
+    if ready:
+        reason = None
+    elif not startup_state["done"]:
+        reason = "starting"
+    elif startup_state["error"]:
+        reason = f"startup failed: {startup_state['error']}"
+    else:
+        reason = "no index yet"
+    body = {
+        "ready": ready,
+        "reason": reason,
+        "agent_loaded": college_bot_agent is not None,
+        "startup_seconds": startup_state["seconds"],
+        "components": {
+            component.name: component.init_seconds
+            for component in (web_loader, pdf_loader, *STARTUP_COMPONENTS)
+        }
     }
+    return JSONResponse(body, status_code=200 if ready else 503)
 
 if __name__ == "__main__":
     import uvicorn
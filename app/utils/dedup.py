@@ -0,0 +1,85 @@
+import zlib
+import numpy as np
+import config as config
+from utils.helper import hash_text, normalize_text
+
+# Mersenne-style prime just above 2**32 for the universal hash family
+_PRIME = np.uint64(4294967311)
+
+class ChunkDeduplicator:
+    """Drop exact and near-duplicate chunks before they are embedded.
+
+    Exact duplicates are caught by hashing the normalized text. Near
+    duplicates use MinHash signatures over word shingles with LSH banding to
+    find candidates, then keep the chunk only if its estimated Jaccard
+    similarity to every earlier candidate is below ``threshold``.
+    """
+
+    def __init__(self, threshold=config.DEDUP_THRESHOLD, num_perm=128, bands=32, shingle_size=5):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(1)
+        # a < 2**31 keeps a * h + b inside uint64 for 32-bit shingle hashes
+        self.a = rng.integers(1, 2 ** 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint64)
+        self.exact = set()
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = []
+        self.seen = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _signature(self, text):
+        words = text.split()
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+    def is_duplicate(self, text):
+        """Return True if text duplicates a chunk seen earlier; otherwise remember it."""
+        self.seen += 1
+        normalized = normalize_text(text).lower()
+        digest = hash_text(normalized)
+        if digest in self.exact:
+            self.exact_duplicates += 1
+            return True
+        self.exact.add(digest)
+
+        signature = self._signature(normalized)
+        band_keys = [
+            hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+        candidates = set()
+        for band, key in enumerate(band_keys):
+            candidates.update(self.buckets[band].get(key, ()))
+        for candidate in candidates:
+            if np.mean(self.signatures[candidate] == signature) >= self.threshold:
+                self.near_duplicates += 1
+                return True
+
+        number = len(self.signatures)
+        self.signatures.append(signature)
+        for band, key in enumerate(band_keys):
+            self.buckets[band].setdefault(key, []).append(number)
+        return False
+
+    def filter(self, documents):
+        """Yield only the documents that are not duplicates."""
+        for doc in documents:
+            if not self.is_duplicate(doc.page_content):
+                yield doc
+
+    def stats(self):
+        dropped = self.exact_duplicates + self.near_duplicates
+        return {
+            "chunks_seen": self.seen,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "chunks_kept": self.seen - dropped,
+            # One embedding call per chunk, so every dropped chunk is a call saved
+            "embedding_calls_saved": dropped,
+        }
@@ -1,5 +1,7 @@
+import hashlib
 import json
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timezone
 
 def format_response(result):
     """Format API responses for consistency."""
@@ -7,15 +9,50 @@ def format_response(result):
         return json.dumps(result, default=str, indent=2)
     return str(result)
 
-def log_query(query, response, chat_history=None):
-    """Log queries and responses for analytics."""
-    timestamp = datetime.now().isoformat()
+def log_query(query, response, chat_history=None, **fields):
+    """Build the analytics entry for a query and its response.
+
+    Nothing is written here; callers hand the entry to a QueryLogSink. Extra
+    fields (latency, cache hit, ...) are stored as-is.
+    """
     log_entry = {
-        "timestamp": timestamp,
+        "timestamp": datetime.now(timezone.utc),
         "query": query,
         "response": response,
-        "chat_history_length": len(chat_history) if chat_history else 0
+        "chat_history_length": len(chat_history) if chat_history else 0,
+        **fields
     }
-    # This could write to a database or log file
-    print(f"Query log: {json.dumps(log_entry)}")
-    return log_entry
\ No newline at end of file
+    return log_entry
+
+def format_sse(event, data):
+    """Encode one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different strings compare equal."""
+    return " ".join(text.split())
+
+def hash_text(text):
+    """Return a stable hex digest for a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def tag_chunks(documents):
+    """Stamp each chunk with a stable chunk_id and a content_hash.
+
+    The chunk ID is derived from the chunk's source, page and position within
+    that page, so re-loading the same source yields the same IDs and only the
+    content hash changes when the text does.
+    """
+    positions = defaultdict(int)
+    for doc in documents:
+        source = doc.metadata.get("source", "")
+        page = doc.metadata.get("page", "")
+        position = positions[(source, page)]
+        positions[(source, page)] += 1
+        doc.metadata["chunk_id"] = hash_text(f"{source}|{page}|{position}")[:32]
+        doc.metadata["content_hash"] = hash_text(doc.page_content)
+        yield doc
+
+def child_config(run_manager):
+    """Run config that nests a wrapped retriever's run under the calling retriever's run."""
+    return {"callbacks": run_manager.get_child()} if run_manager else None
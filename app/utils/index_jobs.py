@@ -0,0 +1,159 @@
+import time
+import uuid
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import config as config
+
+# Job states; a job only moves forward through them
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+
+class IndexJobQueue:
+    """Indexing jobs and the published index version, both kept in MongoDB.
+
+    API workers enqueue jobs and poll current_version(); indexing workers
+    claim jobs, heartbeat while they run them and publish a new version when
+    one succeeds. Builds share the index pointers, keyword indexes and PDF
+    manifest, so only one job runs at a time across all workers: claiming
+    takes a lease document that the heartbeat renews and finish() releases.
+    A job (and the lease) whose heartbeat is older than stale_after, because
+    its worker died, can be claimed again.
+    """
+
+    def __init__(self, db, stale_after=config.INDEX_JOB_STALE_AFTER):
+        self.jobs = db[config.INDEX_JOBS_COLLECTION]
+        self.state = db["index_state"]
+        self.stale_after = stale_after
+        self._indexed = False
+
+    def _ensure_indexes(self):
+        if not self._indexed:
+            self.jobs.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+            self._indexed = True
+
+    def enqueue(self):
+        """Queue an indexing job and return its ID; a job already waiting is reused."""
+        self._ensure_indexes()
+        # Several requests while a job is still queued all get that job
+        pending = self.jobs.find_one({"status": QUEUED}, sort=[("created_at", ASCENDING)])
+        if pending is not None:
+            return pending["_id"]
+        job_id = uuid.uuid4().hex
+        self.jobs.insert_one({
+            "_id": job_id,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "attempts": 0,
+            "progress": {},
+        })
+        return job_id
+
+    def _runnable(self, now):
+        return {"$or": [
+            {"status": QUEUED},
+            {"status": RUNNING, "heartbeat_at": {"$lt": now - self.stale_after}},
+        ]}
+
+    def _acquire_lease(self, worker_id, now):
+        """Take the indexing lease unless another worker holds a fresh one."""
+        try:
+            self.state.find_one_and_update(
+                {"_id": "lease", "$or": [{"worker": None}, {"heartbeat_at": {"$lt": now - self.stale_after}}]},
+                {"$set": {"worker": worker_id, "job_id": None, "heartbeat_at": now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease exists and is held: the filter didn't match, so the upsert tried to insert
+            return False
+        return True
+
+    def _release_lease(self, worker_id):
+        self.state.update_one({"_id": "lease", "worker": worker_id}, {"$set": {"worker": None, "job_id": None}})
+
+    def claim(self, worker_id):
+        """Take the oldest runnable job for worker_id, or return None.
+
+        Returns None while another worker's job is still running.
+        """
+        self._ensure_indexes()
+        now = time.time()
+        # Cheap check first so idle polling doesn't churn the lease
+        if self.jobs.find_one(self._runnable(now), projection={"_id": 1}) is None:
+            return None
+        if not self._acquire_lease(worker_id, now):
+            return None
+        job = self.jobs.find_one_and_update(
+            self._runnable(now),
+            {
+                "$set": {"status": RUNNING, "worker": worker_id, "started_at": now, "heartbeat_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            self._release_lease(worker_id)
+            return None
+        self.state.update_one({"_id": "lease", "worker": worker_id}, {"$set": {"job_id": job["_id"]}})
+        return job
+
+    def heartbeat(self, job_id, worker_id, progress):
+        """Record progress and liveness. Returns False if another worker has taken the job over."""
+        now = time.time()
+        lease = self.state.update_one({"_id": "lease", "worker": worker_id}, {"$set": {"heartbeat_at": now}})
+        result = self.jobs.update_one(
+            {"_id": job_id, "worker": worker_id, "status": RUNNING},
+            {"$set": {"heartbeat_at": now, "progress": progress}}
+        )
+        return lease.matched_count == 1 and result.matched_count == 1
+
+    def finish(self, job_id, worker_id, status, progress, message="", version=None):
+        """Record the outcome of a job and release the lease for the next one."""
+        self.jobs.update_one(
+            {"_id": job_id, "worker": worker_id},
+            {"$set": {
+                "status": status,
+                "finished_at": time.time(),
+                "progress": progress,
+                "message": message,
+                "version": version,
+            }}
+        )
+        self._release_lease(worker_id)
+
+    def get(self, job_id):
+        return self.jobs.find_one({"_id": job_id})
+
+    def latest(self):
+        return self.jobs.find_one(sort=[("created_at", DESCENDING)])
+
+    def publish_version(self, job_id):
+        """Announce that new indexes are live; returns the new version number."""
+        state = self.state.find_one_and_update(
+            {"_id": "current"},
+            {"$inc": {"version": 1}, "$set": {"job_id": job_id, "published_at": time.time()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return state["version"]
+
+    def current_version(self):
+        """The published index version, 0 if nothing was ever published."""
+        state = self.state.find_one({"_id": "current"})
+        return state["version"] if state else 0
+
+    @staticmethod
+    def as_dict(job):
+        """A job document as returned by the status endpoints."""
+        return {
+            "job_id": job["_id"],
+            "status": job["status"],
+            "message": job.get("message", ""),
+            "attempts": job.get("attempts", 0),
+            "worker": job.get("worker"),
+            "created_at": job.get("created_at"),
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+            "version": job.get("version"),
+            "progress": job.get("progress", {}),
+        }
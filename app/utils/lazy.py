@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import time
+
+
+class LazyComponent:
+    """A shared client or model that is built on first use instead of at import time.
+
+    The factory runs at most once, even when several threads ask for the
+    component at the same time, and its wall time is kept in init_seconds.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.init_seconds = None
+        self._instance = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._built
+
+    def get(self):
+        """Return the component, building it on the first call."""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    start = time.perf_counter()
+                    self._instance = self.factory()
+                    self.init_seconds = time.perf_counter() - start
+                    self._built = True
+        return self._instance
+
+    async def aget(self):
+        """Async get(); a first build (imports, client setup) runs off the event loop."""
+        if self._built:
+            return self._instance
+        return await asyncio.to_thread(self.get)
+
+    def peek(self):
+        """Return the component if it has been built, without building it."""
+        return self._instance if self._built else None
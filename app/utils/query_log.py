@@ -0,0 +1,176 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+import config as config
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+class JsonlQueryLogWriter:
+    """Appends batches to a gzip-compressed JSONL file and rotates it by size.
+
+    Each batch is written as its own gzip member, which gzip/zcat read back
+    as one stream. Rotated files get a numeric suffix (queries.jsonl.gz.1, ...).
+    """
+
+    def __init__(self, path, max_bytes=config.QUERY_LOG_MAX_BYTES, backups=config.QUERY_LOG_BACKUPS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, entries):
+        lines = "".join(json.dumps(entry, default=_json_default) + "\n" for entry in entries)
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(lines)
+        if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+
+    def close(self):
+        pass
+
+
+class MongoQueryLogWriter:
+    """Inserts batches into a MongoDB collection, indexed by timestamp for querying."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexed = False
+
+    def write(self, entries):
+        # Created on the writer thread so an unreachable server never delays startup
+        if not self._indexed:
+            self.collection.create_index("timestamp")
+            self._indexed = True
+        # insert_many adds _id to the dicts, so pass copies
+        self.collection.insert_many([dict(entry) for entry in entries], ordered=False)
+
+    def close(self):
+        self.collection.database.client.close()
+
+
+class QueryLogSink:
+    """Bounded in-memory buffer of log entries drained in batches by a background thread.
+
+    submit() only appends to the buffer, so a request pays microseconds for
+    logging. When the buffer is full, overflow="drop" discards the oldest
+    entry (ring buffer) and overflow="block" makes the caller wait up to
+    block_timeout for the writer before discarding the new entry. Code on
+    an event loop uses asubmit(), which does that waiting in a worker thread.
+    """
+
+    def __init__(
+        self,
+        writer,
+        capacity=config.QUERY_LOG_BUFFER_SIZE,
+        batch_size=config.QUERY_LOG_BATCH_SIZE,
+        flush_interval=config.QUERY_LOG_FLUSH_INTERVAL,
+        overflow=config.QUERY_LOG_OVERFLOW,
+        block_timeout=config.QUERY_LOG_BLOCK_TIMEOUT,
+    ):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"Unknown query log overflow policy: {overflow}")
+        self.writer = writer
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.buffer = deque()
+        # One condition for both "entries to write" and "space in the buffer"
+        self.condition = threading.Condition()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, entry):
+        """Buffer an entry for writing. Returns False if it was dropped."""
+        with self.condition:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self.buffer) >= self.capacity:
+                if self.overflow == "block":
+                    self.condition.notify_all()
+                    if not self.condition.wait_for(lambda: len(self.buffer) < self.capacity, self.block_timeout):
+                        self.dropped += 1
+                        return False
+                else:
+                    self.buffer.popleft()
+                    self.dropped += 1
+            self._append(entry)
+        return True
+
+    async def asubmit(self, entry):
+        """submit() for coroutines: a full buffer in block mode only holds up the caller, not the loop."""
+        if self.overflow == "block":
+            with self.condition:
+                if not self._closed and len(self.buffer) < self.capacity:
+                    self._append(entry)
+                    return True
+            return await asyncio.to_thread(self.submit, entry)
+        return self.submit(entry)
+
+    def _append(self, entry):
+        # Called with the condition held
+        self.buffer.append(entry)
+        if len(self.buffer) >= self.batch_size:
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: len(self.buffer) >= self.batch_size or self._closed, self.flush_interval
+                )
+                batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+                closed = self._closed
+                # Wake producers waiting for space
+                self.condition.notify_all()
+            if batch:
+                try:
+                    self.writer.write(batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    logging.warning(f"Couldn't write {len(batch)} query log entries: {e}")
+            elif closed:
+                return
+
+    def close(self, timeout=10.0):
+        """Flush everything still buffered, then stop the writer thread."""
+        with self.condition:
+            self._closed = True
+            self.condition.notify_all()
+        self._thread.join(timeout)
+        self.writer.close()
+
+    def stats(self):
+        return {
+            "buffered": len(self.buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import config as config
+from utils.helper import normalize_text
+
+
+def normalize_query(text):
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"[\s?!.]+$", "", normalize_text(text).lower())
+
+
+class SemanticResponseCache:
+    """TTL + LRU cache of bot answers for history-free queries.
+
+    Exact repeats are matched on the normalized query text. Otherwise the
+    query embedding is compared against cached queries and the closest one is
+    reused if its cosine similarity reaches ``threshold``. clear() starts a new
+    generation; set() drops answers computed in an earlier one, so a query
+    that was still running on the old index during a re-index can't cache
+    its answer afterwards.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        threshold=config.RESPONSE_CACHE_THRESHOLD,
+        ttl=config.RESPONSE_CACHE_TTL,
+        max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # normalized query -> (unit query vector, response, expiry time)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _purge_expired(self, now):
+        expired = [key for key, (_, _, expires_at) in self.entries.items() if expires_at <= now]
+        for key in expired:
+            del self.entries[key]
+
+    async def _embed(self, query):
+        vector = np.asarray(await asyncio.to_thread(self.embeddings.embed_query, query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def get(self, query):
+        """Return a cached response for query, or None."""
+        key = normalize_query(query)
+        with self.lock:
+            self._purge_expired(time.time())
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][1]
+            if not self.entries:
+                self.misses += 1
+                return None
+
+        try:
+            vector = await self._embed(query)
+        except Exception as e:
+            print(f"Response cache lookup failed: {e}")
+            self.misses += 1
+            return None
+
+        with self.lock:
+            keys = list(self.entries)
+            if keys:
+                similarities = np.stack([self.entries[k][0] for k in keys]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.entries.move_to_end(keys[best])
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return self.entries[keys[best]][1]
+            self.misses += 1
+        return None
+
+    async def set(self, query, response, generation):
+        """Cache a response for query, computed while self.generation was generation."""
+        if generation != self.generation:
+            return
+        try:
+            vector = await self._embed(query)
+        except Exception as e:
+            print(f"Response cache store failed: {e}")
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            key = normalize_query(query)
+            self.entries[key] = (vector, response, time.time() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached response, e.g. after a re-index."""
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,297 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+import config as config
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Span:
+    """One timed operation. Spans started under another share its trace_id."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "root", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, parent=None, attributes=None, start_ns=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.root = parent.root if parent else self
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    @property
+    def duration(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, key, value):
+        """Add to a numeric attribute, e.g. token totals rolled up on the root span."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def to_otlp(self):
+        """Span in the OTLP/JSON encoding."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Stand-in returned when tracing is disabled."""
+
+    trace_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, key, value):
+        pass
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class MetricsRegistry:
+    """Counters and histograms rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        # (name, labels) -> [per-bucket counts..., +Inf count], sum
+        self.histograms = {}
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts, _ = self.histograms[key]
+            counts[bisect_left(self.buckets, value)] += 1
+            self.histograms[key][1] += value
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = [*labels, *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{str(value)}"' for key, value in pairs) + "}"
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(counts), total)) for key, (counts, total) in self.histograms.items())
+
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{self._labels(labels)} {value:g}")
+        for (name, labels), (counts, total) in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total:g}")
+            lines.append(f"{name}_count{self._labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonlSpanExporter:
+    """Writes finished spans as OTLP/JSON lines from a background thread.
+
+    export() only enqueues, so the request path never touches the disk; when
+    the queue is full new spans are dropped and counted instead of blocking.
+    """
+
+    def __init__(self, path, max_queue=config.TRACE_QUEUE_SIZE, batch_size=512, flush_interval=1.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        """Queue a span for writing; returns False if it had to be dropped."""
+        try:
+            self.queue.put_nowait(span)
+            return True
+        except queue.Full:
+            return False
+
+    def _write(self, spans):
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", "college-bot")]},
+            "scopeSpans": [{"scope": {"name": "college-bot"}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(request) + "\n")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if None in batch:
+                stopping = True
+                batch = [span for span in batch if span is not None]
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    logging.warning(f"Couldn't export {len(batch)} spans: {e}")
+
+    def shutdown(self, timeout=5.0):
+        """Flush queued spans and stop the writer thread."""
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+
+class Tracer:
+    """Creates spans, tracks the current one per task/thread and records their metrics."""
+
+    def __init__(self, metrics, exporter=None, enabled=True):
+        self.metrics = metrics
+        self.exporter = exporter
+        self.enabled = enabled
+        self._current = contextvars.ContextVar("current_span", default=None)
+
+    def current_span(self):
+        return self._current.get()
+
+    def start_span(self, name, parent=None, **attributes):
+        """Start a span without making it current (for callback-style instrumentation)."""
+        return Span(name, parent or self._current.get(), attributes)
+
+    def end_span(self, span, error=None):
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+            self.metrics.inc("collegebot_span_errors_total", span=span.name)
+        self.metrics.observe("collegebot_span_duration_seconds", span.duration, span=span.name)
+        if self.exporter is not None and not self.exporter.export(span):
+            self.metrics.inc("collegebot_spans_dropped_total")
+
+    def record(self, name, duration, error=None, **attributes):
+        """Record an operation that has already finished, e.g. from a driver event."""
+        if not self.enabled:
+            return
+        span = Span(name, self._current.get(), attributes, start_ns=time.time_ns() - int(duration * 1e9))
+        self.end_span(span, error)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block as a child of the current span."""
+        if not self.enabled:
+            yield _NoopSpan()
+            return
+        span = self.start_span(name, **attributes)
+        token = self._current.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            try:
+                self._current.reset(token)
+            except ValueError:
+                # An async generator being closed from another task/context
+                pass
+            self.end_span(span, error)
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+metrics = MetricsRegistry()
+metrics.describe("collegebot_span_duration_seconds", "Duration of traced operations by span name.")
+metrics.describe("collegebot_span_errors_total", "Traced operations that raised, by span name.")
+metrics.describe("collegebot_llm_tokens_total", "LLM tokens by direction (input/output).")
+metrics.describe("collegebot_embedding_cache_total", "Embedding lookups served from cache (hit) or the model (miss).")
+metrics.describe("collegebot_spans_dropped_total", "Spans not exported because the export queue was full.")
+metrics.describe("collegebot_queries_total", "Answered queries by endpoint and whether the response cache served them.")
+
+tracer = Tracer(
+    metrics,
+    JsonlSpanExporter(config.TRACE_EXPORT_PATH) if config.TRACING_ENABLED and config.TRACE_EXPORT_PATH else None,
+    enabled=config.TRACING_ENABLED
+)
+
+
+def configure_logging(level=logging.INFO):
+    """Route log records through a queue so formatting and I/O happen on a background thread.
+
+    Returns the QueueListener (stop it at shutdown to flush), or None if
+    logging was already configured this way.
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, logging.handlers.QueueHandler) for handler in root.handlers):
+        return None
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    return listener
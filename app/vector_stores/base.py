@@ -0,0 +1,129 @@
+import asyncio
+import os
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from utils.dedup import ChunkDeduplicator
+from utils.helper import tag_chunks
+from vector_stores.embedding_cache import CachedEmbeddings, SQLiteEmbeddingStore
+from vector_stores.keyword_index import HybridRetriever, KeywordIndex
+import config as config
+
+def create_embeddings():
+    """Build the Gemini embedding model behind the embedding cache."""
+    embeddings = GoogleGenerativeAIEmbeddings(
+        model=config.EMBEDDING_MODEL,
+        google_api_key=config.GOOGLE_API_KEY
+    )
+    cache_store = SQLiteEmbeddingStore(config.EMBEDDING_CACHE_PATH) if config.EMBEDDING_CACHE_PATH else None
+    return CachedEmbeddings(
+        embeddings,
+        config.EMBEDDING_MODEL,
+        store=cache_store,
+        max_memory_items=config.EMBEDDING_CACHE_MEMORY_ITEMS
+    )
+
+class BaseVectorStore:
+    """Embedding setup and INDEX_MODE dispatch shared by the vector store backends.
+
+    Backends implement create_from_documents, update_from_documents,
+    stream_from_documents and load_vector_store. Full rebuilds take a
+    build_id (e.g. an indexing job ID) that keeps their output apart from
+    any other build of the same collection. All of them take the run's
+    IndexingProgress and call its check_cancelled() before each write.
+    """
+
+    def __init__(self, embeddings=None):
+        self.embeddings = embeddings or create_embeddings()
+        self.keyword_indexes = {}
+
+    def _keyword_index_path(self, collection_name):
+        return os.path.join(config.KEYWORD_INDEX_DIR, f"{collection_name}.pkl")
+
+    def keyword_index(self, collection_name):
+        """Return the collection's BM25 index, loading it from disk on first use."""
+        if collection_name not in self.keyword_indexes:
+            self.keyword_indexes[collection_name] = KeywordIndex.load(self._keyword_index_path(collection_name))
+        return self.keyword_indexes[collection_name]
+
+    @staticmethod
+    def _check_cancelled(progress):
+        if progress is not None:
+            progress.check_cancelled()
+
+    def _feed_keyword_index(self, documents, target, seen, progress=None):
+        """Pass documents through while adding them to a keyword index."""
+        for doc in tag_chunks(documents):
+            self._check_cancelled(progress)
+            target.add(doc)
+            seen.add(doc.metadata["chunk_id"])
+            yield doc
+
+    def _commit_keyword_index(self, collection_name, target, seen, keep_sources):
+        """Finish a keyword index update once the vector index has been written.
+
+        Incremental runs upsert into the live index as documents pass, so only
+        missing chunks are dropped here. Full rebuilds fill a fresh index that
+        only retrievers built from now on get: the agent still serving keeps
+        the old one, matching its old vectors, until it is swapped out.
+        """
+        if target is self.keyword_index(collection_name):
+            target.retain(seen, keep_sources)
+        else:
+            self.keyword_indexes[collection_name] = target
+        target.save(self._keyword_index_path(collection_name))
+
+    def get_retriever(self, collection_name):
+        """Retriever for a collection: hybrid BM25 + vector when HYBRID_RETRIEVAL is on."""
+        vector_store = self.load_vector_store(collection_name)
+        if not config.HYBRID_RETRIEVAL:
+            return vector_store.as_retriever()
+        return HybridRetriever(
+            dense_retriever=vector_store.as_retriever(search_kwargs={"k": config.HYBRID_CANDIDATES}),
+            keyword_index=self.keyword_index(collection_name),
+            k=config.RETRIEVER_K,
+            candidates=config.HYBRID_CANDIDATES
+        )
+
+    def reload(self):
+        """Forget per-process index state so the next retrievers read what another process published.
+
+        Retrievers already handed out keep the indexes they were built with.
+        """
+        self.keyword_indexes = {}
+
+    def garbage_collect(self, collection_name):
+        """Remove superseded index versions. Backends that swap in place have none."""
+
+    def has_index(self, collection_name):
+        """Whether the collection holds any indexed chunks."""
+        raise NotImplementedError
+
+    def index_documents(self, documents, collection_name, keep_sources=(), build_id=None, progress=None):
+        """Index documents using the configured INDEX_MODE ("incremental" or "full")."""
+        if config.INDEX_MODE == "full":
+            return self.create_from_documents(documents, collection_name, build_id=build_id, progress=progress)
+        return self.update_from_documents(documents, collection_name, keep_sources, progress=progress)
+
+    async def aindex_documents(self, documents, collection_name, keep_sources=(), progress=None, build_id=None):
+        """Async entry point that also supports the "streaming" INDEX_MODE."""
+        deduplicator = ChunkDeduplicator() if config.DEDUP_ENABLED else None
+        if deduplicator:
+            documents = deduplicator.filter(documents)
+        keyword_target = self.keyword_index(collection_name) if config.INDEX_MODE == "incremental" else KeywordIndex()
+        seen = set()
+        documents = self._feed_keyword_index(documents, keyword_target, seen, progress)
+        if config.INDEX_MODE == "streaming":
+            result = await self.stream_from_documents(documents, collection_name, progress, build_id=build_id)
+        else:
+            # The sync paths embed and write in-line, so keep them off the event loop
+            result = await asyncio.to_thread(
+                self.index_documents, documents, collection_name, keep_sources, build_id, progress
+            )
+        self._check_cancelled(progress)
+        await asyncio.to_thread(self._commit_keyword_index, collection_name, keyword_target, seen, keep_sources)
+
+        if deduplicator:
+            stats = deduplicator.stats()
+            print(f"Dedup for '{collection_name}': {stats}")
+            if progress is not None:
+                progress.dedup[collection_name] = stats
+        return result
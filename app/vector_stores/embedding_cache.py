@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from utils.helper import hash_text, normalize_text
+from utils.tracing import tracer
+
+
+class SQLiteEmbeddingStore:
+    """On-disk embedding cache backed by a single SQLite table."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get_many(self, namespace, keys):
+        """Return {key: vector} for the keys present in the store."""
+        keys = list(keys)
+        found = {}
+        with self.lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE namespace = ? AND key IN ({placeholders})",
+                    [namespace, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def set_many(self, namespace, items):
+        """Store {key: vector} pairs."""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (namespace, key, vector) VALUES (?, ?, ?)",
+                [(namespace, key, array("f", vector).tobytes()) for key, vector in items.items()]
+            )
+            self.conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that caches vectors by (model, normalized text hash).
+
+    Lookups go to an in-process LRU first and then to the optional on-disk
+    store; only texts missing from both are sent to the wrapped model.
+    """
+
+    def __init__(self, embeddings, model_name, store=None, max_memory_items=10000):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.store = store
+        self.max_memory_items = max_memory_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, namespace, items):
+        with self.lock:
+            for key, vector in items.items():
+                self.memory[(namespace, key)] = vector
+                self.memory.move_to_end((namespace, key))
+            while len(self.memory) > self.max_memory_items:
+                self.memory.popitem(last=False)
+
+    def _embed(self, texts, kind, embed_fn):
+        with tracer.span(f"embedding.{kind}", texts=len(texts)) as span:
+            vectors, misses = self._embed_cached(texts, kind, embed_fn)
+            span.set(cache_hits=len(texts) - misses, cache_misses=misses)
+        tracer.metrics.inc("collegebot_embedding_cache_total", len(texts) - misses, result="hit")
+        tracer.metrics.inc("collegebot_embedding_cache_total", misses, result="miss")
+        return vectors
+
+    def _embed_cached(self, texts, kind, embed_fn):
+        """Return (vectors, number of texts the model had to embed)."""
+        # Query and document embeddings use different task types, so cache them apart
+        namespace = f"{self.model_name}:{kind}"
+        keys = [hash_text(normalize_text(text)) for text in texts]
+
+        found = {}
+        with self.lock:
+            for key in keys:
+                vector = self.memory.get((namespace, key))
+                if vector is not None:
+                    self.memory.move_to_end((namespace, key))
+                    found[key] = vector
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.store is not None:
+            from_disk = self.store.get_many(namespace, missing)
+            self._remember(namespace, from_disk)
+            found.update(from_disk)
+            missing = [key for key in missing if key not in found]
+
+        if missing:
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            vectors = embed_fn([first_text[key] for key in missing])
+            computed = dict(zip(missing, vectors))
+            self._remember(namespace, computed)
+            if self.store is not None:
+                self.store.set_many(namespace, computed)
+            found.update(computed)
+
+        with self.lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+        return [found[key] for key in keys], len(missing)
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def stats(self):
+        """Return hit/miss counters for monitoring."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory_items": len(self.memory),
+        }
@@ -0,0 +1,196 @@
+import asyncio
+import time
+from itertools import islice
+import config as config
+
+
+class IndexingCancelled(Exception):
+    """Raised inside a build that was told to stop, e.g. after its job lease was lost."""
+
+
+class IndexingProgress:
+    """Progress of the current indexing run, reported through /index/status."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.status = "idle"
+        self.stage = None
+        self.message = ""
+        self.chunks_done = 0
+        self.batches_done = 0
+        self.batches_failed = 0
+        self.dedup = {}
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = False
+
+    def start(self):
+        self.reset()
+        self.status = "processing"
+        self.started_at = time.time()
+
+    def set_stage(self, stage):
+        self.stage = stage
+        print(f"Indexing stage: {stage}")
+
+    def cancel(self):
+        """Ask the build to stop. Cancelling its task alone doesn't stop work already in a thread."""
+        self.cancelled = True
+
+    def check_cancelled(self):
+        """Raise IndexingCancelled if the build was asked to stop; write loops call this before writing."""
+        if self.cancelled:
+            raise IndexingCancelled("Indexing build was cancelled")
+
+    def record_batch(self, size):
+        self.chunks_done += size
+        self.batches_done += 1
+
+    def finish(self, status="completed", message=""):
+        self.status = status
+        self.message = message
+        self.finished_at = time.time()
+
+    def as_dict(self):
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "status": self.status,
+            "stage": self.stage,
+            "message": self.message,
+            "chunks_done": self.chunks_done,
+            "batches_done": self.batches_done,
+            "batches_failed": self.batches_failed,
+            "dedup": self.dedup,
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(self.chunks_done / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class IngestionPipeline:
+    """Embed and write documents in fixed-size batches with bounded concurrency.
+
+    Documents are pulled lazily from any iterable. A new batch is only taken
+    once a concurrency slot is free, so at most ``max_concurrency`` batches are
+    held in memory regardless of corpus size. ``writer(documents, vectors)`` is
+    called for every batch as soon as it is embedded. A batch that still fails
+    after its retries is counted and skipped rather than aborting the run,
+    unless ``stop_on_failure`` is set: then no further batches are taken,
+    batches in flight are cancelled and run() raises, so a build that can't
+    go live stops spending on embeddings. A cancelled ``progress`` stops the
+    run the same way, before any further batch is written.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        writer,
+        batch_size=config.INDEX_BATCH_SIZE,
+        max_concurrency=config.EMBEDDING_CONCURRENCY,
+        max_retries=config.EMBEDDING_MAX_RETRIES,
+        retry_backoff=config.EMBEDDING_RETRY_BACKOFF,
+        progress=None,
+        stop_on_failure=False,
+    ):
+        self.embeddings = embeddings
+        self.writer = writer
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.progress = progress or IndexingProgress()
+        self.stop_on_failure = stop_on_failure
+        self.failure = None
+
+    async def _embed_with_retry(self, texts):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await asyncio.to_thread(self.embeddings.embed_documents, texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                print(f"Embedding batch failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _process_batch(self, batch, slots):
+        try:
+            vectors = await self._embed_with_retry([doc.page_content for doc in batch])
+            if self.progress.cancelled:
+                return
+            await asyncio.to_thread(self.writer, batch, vectors)
+            self.progress.record_batch(len(batch))
+        except Exception as e:
+            self.progress.batches_failed += 1
+            print(f"Dropped batch of {len(batch)} chunks: {e}")
+            if self.failure is None:
+                self.failure = e
+        finally:
+            slots.release()
+
+    async def run(self, documents):
+        """Consume documents until exhausted and return the number of chunks written."""
+        iterator = iter(documents)
+        slots = asyncio.Semaphore(self.max_concurrency)
+        tasks = set()
+        written_before = self.progress.chunks_done
+        self.failure = None
+
+        while True:
+            # Backpressure: don't pull more input until a batch slot is free
+            await slots.acquire()
+            if self.progress.cancelled or (self.stop_on_failure and self.failure):
+                slots.release()
+                break
+            # The iterator may do blocking work (parsing, crawling), keep it off the event loop
+            batch = await asyncio.to_thread(lambda: list(islice(iterator, self.batch_size)))
+            if not batch:
+                slots.release()
+                break
+            task = asyncio.create_task(self._process_batch(batch, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if self.progress.cancelled or (self.stop_on_failure and self.failure):
+            for task in tasks:
+                task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.progress.check_cancelled()
+        if self.stop_on_failure and self.failure:
+            raise RuntimeError(f"Stopped indexing after a batch failed: {self.failure}") from self.failure
+        return self.progress.chunks_done - written_before
+
+
+async def build_indexes(crawler, pdf_reader, store, progress, build_id=None):
+    """Crawl the website and parse PDFs into new versions of both indexes.
+
+    Shared by inline indexing in the API process and the dedicated indexing
+    worker; callers decide how the new indexes are picked up. build_id names
+    the new index versions (the worker passes its job ID). Calling
+    progress.cancel() stops the build at its next write.
+    """
+    # Load and index website content
+    progress.set_stage("crawling website")
+    web_docs = await crawler.crawl_website_async()
+    print(f"Crawled {len(web_docs)} website documents")
+
+    progress.set_stage("indexing website")
+    await store.aindex_documents(web_docs, "website", progress=progress, build_id=build_id)
+    print("Website content indexed successfully")
+
+    # Load and index PDF content
+    # PDFs are parsed in a process pool and streamed into the index as they finish
+    progress.set_stage("indexing pdfs")
+    pdf_docs = pdf_reader.load_pdfs_parallel(skip_unchanged=config.INDEX_MODE == "incremental")
+    await store.aindex_documents(
+        pdf_docs,
+        "pdfs",
+        keep_sources=pdf_reader.unchanged_files,
+        progress=progress,
+        build_id=build_id
+    )
+    progress.check_cancelled()
+    pdf_reader.commit_manifest()
+    print("PDF content indexed successfully")
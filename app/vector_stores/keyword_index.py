@@ -0,0 +1,204 @@
+import asyncio
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from utils.helper import child_config, hash_text
+
+# Keeps course codes, room numbers and form IDs (CS-101, B.Tech, 2.14A) as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./_][a-z0-9]+)*")
+
+def tokenize(text):
+    """Lowercase tokens; compound tokens also emit their parts and a joined form,
+    so "CS-101" matches "cs 101" and "cs101"."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = [part for part in re.split(r"[-./_]", token) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+            tokens.append("".join(parts))
+    return tokens
+
+def document_key(doc):
+    """Identity used to match the same chunk across retrievers."""
+    return doc.metadata.get("chunk_id") or hash_text(doc.page_content)
+
+class KeywordIndex:
+    """Incrementally maintained BM25 inverted index over chunks.
+
+    Postings are stored per term as a flat array('I') of (doc number, term
+    frequency) pairs. Removing a chunk leaves a tombstone that queries skip;
+    the postings are compacted once tombstones outnumber live chunks.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.postings = {}
+        self.records = []  # doc number -> {"text", "metadata"}, or None once removed
+        self.doc_lengths = array("I")
+        self.by_key = {}  # chunk key -> doc number
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.by_key)
+
+    def add(self, doc):
+        """Insert or replace a chunk."""
+        key = document_key(doc)
+        with self.lock:
+            number = self.by_key.get(key)
+            if number is not None:
+                if self.records[number]["metadata"].get("content_hash") == doc.metadata.get("content_hash") \
+                        and self.records[number]["text"] == doc.page_content:
+                    return
+                self._remove_number(number)
+            terms = Counter(tokenize(doc.page_content))
+            number = len(self.records)
+            self.records.append({"text": doc.page_content, "metadata": dict(doc.metadata)})
+            length = sum(terms.values())
+            self.doc_lengths.append(length)
+            self.total_length += length
+            self.by_key[key] = number
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, array("I")).extend((number, frequency))
+
+    def _remove_number(self, number):
+        self.records[number] = None
+        self.total_length -= self.doc_lengths[number]
+
+    def _maybe_compact(self):
+        if len(self.records) > 2 * len(self.by_key) + 1000:
+            self.compact()
+
+    def remove(self, key):
+        with self.lock:
+            number = self.by_key.pop(key, None)
+            if number is not None:
+                self._remove_number(number)
+                self._maybe_compact()
+
+    def retain(self, keys, keep_sources=()):
+        """Remove every chunk not in keys, except chunks from keep_sources."""
+        keep_sources = set(keep_sources)
+        with self.lock:
+            stale = [
+                key for key, number in self.by_key.items()
+                if key not in keys and self.records[number]["metadata"].get("source") not in keep_sources
+            ]
+            for key in stale:
+                self._remove_number(self.by_key.pop(key))
+            self._maybe_compact()
+
+    def compact(self):
+        """Rebuild postings without tombstones."""
+        with self.lock:
+            live = [Document(page_content=r["text"], metadata=r["metadata"]) for r in self.records if r is not None]
+            self._reset()
+            for doc in live:
+                self.add(doc)
+
+    def search(self, query, k=4):
+        """Return the top-k (Document, BM25 score) pairs for a query."""
+        with self.lock:
+            live = len(self.by_key)
+            if not live:
+                return []
+            average_length = self.total_length / live
+            scores = {}
+            for term in set(tokenize(query)):
+                plist = self.postings.get(term)
+                if plist is None:
+                    continue
+                frequency = len(plist) // 2
+                idf = math.log(1 + (live - frequency + 0.5) / (frequency + 0.5))
+                for i in range(0, len(plist), 2):
+                    number, tf = plist[i], plist[i + 1]
+                    if self.records[number] is None:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[number] / average_length)
+                    scores[number] = scores.get(number, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [
+                (Document(page_content=self.records[n]["text"], metadata=dict(self.records[n]["metadata"])), score)
+                for n, score in best
+            ]
+
+    def save(self, path):
+        with self.lock:
+            state = {
+                "postings": {term: plist.tobytes() for term, plist in self.postings.items()},
+                "records": self.records,
+                "doc_lengths": self.doc_lengths.tobytes(),
+                "by_key": self.by_key,
+                "total_length": self.total_length,
+            }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, or return an empty one if there is none."""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        for term, raw in state["postings"].items():
+            index.postings[term] = array("I")
+            index.postings[term].frombytes(raw)
+        index.records = state["records"]
+        index.doc_lengths.frombytes(state["doc_lengths"])
+        index.by_key = state["by_key"]
+        index.total_length = state["total_length"]
+        return index
+
+def reciprocal_rank_fusion(result_lists, k, rrf_k=60):
+    """Merge ranked document lists by summing 1 / (rrf_k + rank)."""
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in ranked]
+
+class HybridRetriever(BaseRetriever):
+    """Dense retriever fused with a BM25 keyword index by reciprocal-rank fusion."""
+
+    dense_retriever: BaseRetriever
+    keyword_index: KeywordIndex
+    k: int = 4
+    candidates: int = 20
+    rrf_k: int = 60
+
+    def _keyword_docs(self, query):
+        return [doc for doc, _ in self.keyword_index.search(query, self.candidates)]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        dense = self.dense_retriever.invoke(query, child_config(run_manager))
+        return reciprocal_rank_fusion([dense, self._keyword_docs(query)], self.k, self.rrf_k)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        dense, sparse = await asyncio.gather(
+            self.dense_retriever.ainvoke(query, child_config(run_manager)),
+            asyncio.to_thread(self._keyword_docs, query)
+        )
+        return reciprocal_rank_fusion([dense, sparse], self.k, self.rrf_k)
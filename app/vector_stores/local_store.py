@@ -0,0 +1,346 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from utils.helper import tag_chunks
+from vector_stores.base import BaseVectorStore
+from vector_stores.ingestion import IngestionPipeline
+import config as config
+
+def _normalize(matrix):
+    """Scale rows to unit length so a dot product is cosine similarity."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first."""
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+class LocalVectorIndex:
+    """Embedding matrix and documents for one collection, kept on local disk.
+
+    Each write goes to a fresh generation directory holding vectors.npy,
+    docs.json and, when enabled, an IVF approximate index (ivf.npz). The
+    CURRENT file names the live generation and is replaced atomically, so a
+    crash mid-write never leaves a half-written index. Superseded generations
+    stay on disk until garbage_collect(), because another process may have
+    read the old CURRENT and not opened its files yet. Nothing is read until
+    the first search, and vectors are memory-mapped.
+    """
+
+    def __init__(self, path, ivf_lists=config.LOCAL_INDEX_IVF_LISTS, nprobe=config.LOCAL_INDEX_NPROBE):
+        self.path = path
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self.lock = threading.Lock()
+        # (vectors, docs, ivf) replaced as a whole so readers never see a mix
+        self._state = None
+
+    def _current_dir(self):
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                return os.path.join(self.path, f.read().strip())
+        except OSError:
+            return None
+
+    def _load(self):
+        directory = self._current_dir()
+        if directory is None:
+            return np.zeros((0, 0), dtype=np.float32), [], None
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "docs.json")) as f:
+            docs = json.load(f)
+        ivf = None
+        ivf_path = os.path.join(directory, "ivf.npz")
+        if os.path.exists(ivf_path):
+            data = np.load(ivf_path)
+            ivf = (data["centroids"], data["offsets"], data["order"])
+        return vectors, docs, ivf
+
+    @property
+    def state(self):
+        if self._state is None:
+            with self.lock:
+                if self._state is None:
+                    self._state = self._load()
+        return self._state
+
+    def __len__(self):
+        return len(self.state[1])
+
+    def items(self):
+        """Return (record, vector) pairs for every stored chunk."""
+        vectors, docs, _ = self.state
+        return list(zip(docs, vectors))
+
+    def _build_ivf(self, vectors, iterations=10):
+        """Cluster vectors with spherical k-means and group them by cluster."""
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(len(vectors), self.ivf_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            for cluster in range(self.ivf_lists):
+                members = vectors[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(self.ivf_lists + 1))
+        return centroids, offsets, order
+
+    def replace(self, vectors, docs):
+        """Persist a new matrix and document list, then swap them in."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = _normalize(vectors) if len(vectors) else np.zeros((0, 0), dtype=np.float32)
+        # Too few points per list makes IVF slower and less accurate than exact search
+        ivf = self._build_ivf(vectors) if self.ivf_lists and len(vectors) >= self.ivf_lists * 40 else None
+
+        generation = f"gen-{time.time_ns()}"
+        directory = os.path.join(self.path, generation)
+        os.makedirs(directory)
+        np.save(os.path.join(directory, "vectors.npy"), vectors)
+        with open(os.path.join(directory, "docs.json"), "w") as f:
+            json.dump(docs, f)
+        if ivf is not None:
+            np.savez(os.path.join(directory, "ivf.npz"), centroids=ivf[0], offsets=ivf[1], order=ivf[2])
+
+        pointer = os.path.join(self.path, "CURRENT.tmp")
+        with open(pointer, "w") as f:
+            f.write(generation)
+        os.replace(pointer, os.path.join(self.path, "CURRENT"))
+        self._state = (vectors, docs, ivf)
+
+    def garbage_collect(self, keep=config.INDEX_KEEP_VERSIONS):
+        """Delete old generations, keeping the live one and the `keep` newest before it."""
+        current = self._current_dir()
+        generations = sorted(
+            (int(name[len("gen-"):]), name) for name in os.listdir(self.path)
+            if name.startswith("gen-") and name[len("gen-"):].isdigit()
+        )
+        old = [name for _, name in generations if os.path.join(self.path, name) != current]
+        for name in old[:max(0, len(old) - keep)]:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+            print(f"Dropped old index generation '{name}'")
+
+    def search(self, query_vectors, k=4):
+        """Batched top-k cosine search; returns one [(record, score)] list per query."""
+        vectors, docs, ivf = self.state
+        queries = _normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        if not docs:
+            return [[] for _ in queries]
+
+        results = []
+        if ivf is None:
+            for scores in queries @ vectors.T:
+                results.append([(docs[i], float(scores[i])) for i in _top_k(scores, k)])
+            return results
+
+        centroids, offsets, order = ivf
+        probes = np.argsort(-(queries @ centroids.T), axis=1)[:, :self.nprobe]
+        for query, lists in zip(queries, probes):
+            candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists])
+            scores = vectors[candidates] @ query
+            results.append([(docs[candidates[i]], float(scores[i])) for i in _top_k(scores, k)])
+        return results
+
+class LocalVectorSearch(VectorStore):
+    """LangChain VectorStore over a LocalVectorIndex."""
+
+    def __init__(self, index, embedding):
+        self.index = index
+        self.embedding = embedding
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        new_vectors = self.embedding.embed_documents(texts)
+        items = self.index.items()
+        self.index.replace(
+            [vector for _, vector in items] + new_vectors,
+            [record for record, _ in items] + [{"text": t, "metadata": m} for t, m in zip(texts, metadatas)]
+        )
+        return [str(len(items) + i) for i in range(len(texts))]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        return [
+            (Document(page_content=record["text"], metadata=record["metadata"]), score)
+            for record, score in self.index.search([embedding], k)[0]
+        ]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, path=None, **kwargs):
+        store = cls(LocalVectorIndex(path or config.LOCAL_INDEX_DIR), embedding)
+        store.add_texts(texts, metadatas)
+        return store
+
+class LocalVectorStore(BaseVectorStore):
+    """In-process vector backend: one memory-mapped NumPy index per collection."""
+
+    def __init__(self, embeddings=None, index_dir=config.LOCAL_INDEX_DIR):
+        super().__init__(embeddings)
+        self.client = None
+        self.index_dir = index_dir
+        self.indexes = {}
+
+    def reload(self):
+        super().reload()
+        self.indexes = {}
+
+    def _index(self, collection_name):
+        if collection_name not in self.indexes:
+            path = os.path.join(self.index_dir, collection_name)
+            os.makedirs(path, exist_ok=True)
+            self.indexes[collection_name] = LocalVectorIndex(path)
+        return self.indexes[collection_name]
+
+    @staticmethod
+    def _to_record(doc):
+        return {"text": doc.page_content, "metadata": dict(doc.metadata)}
+
+    def _embed(self, documents, progress=None):
+        vectors = []
+        for start in range(0, len(documents), config.INDEX_BATCH_SIZE):
+            self._check_cancelled(progress)
+            batch = documents[start:start + config.INDEX_BATCH_SIZE]
+            vectors.extend(self.embeddings.embed_documents([doc.page_content for doc in batch]))
+        return vectors
+
+    def _check_rebuild(self, collection_name, count, expected_count):
+        """Refuse a rebuilt index that lost chunks or is much smaller than the live one."""
+        if count != expected_count:
+            raise ValueError(f"Rebuilt '{collection_name}' has {count} chunks, expected {expected_count}")
+        live_count = len(self._index(collection_name))
+        if count < live_count * config.INDEX_MIN_COUNT_RATIO:
+            raise ValueError(
+                f"Rebuilt '{collection_name}' has {count} chunks, under {config.INDEX_MIN_COUNT_RATIO:.0%} "
+                f"of the live index ({live_count}); keeping the live index"
+            )
+
+    def _publish(self, collection_name, vectors, records):
+        """Write a new generation through a fresh index object.
+
+        Retrievers already handed out keep the old object and its generation,
+        so the agent still serving never mixes new vectors with its old
+        keyword index; retrievers built from now on get the new one.
+        """
+        live = self._index(collection_name)
+        # Pin the old generation in the old object before CURRENT moves
+        live.state
+        index = LocalVectorIndex(live.path)
+        index.replace(vectors, records)
+        self.indexes[collection_name] = index
+
+    def create_from_documents(self, documents, collection_name, build_id=None, progress=None):
+        """Create a vector store from documents. Generations are uniquely named, so build_id isn't needed."""
+        documents = list(tag_chunks(documents))
+        self._check_rebuild(collection_name, len(documents), len(documents))
+        vectors = self._embed(documents, progress)
+        self._check_cancelled(progress)
+        self._publish(collection_name, vectors, [self._to_record(doc) for doc in documents])
+        return self.load_vector_store(collection_name)
+
+    def update_from_documents(self, documents, collection_name, keep_sources=(), progress=None):
+        """Incrementally sync a collection, embedding only new or changed chunks."""
+        index = self._index(collection_name)
+        existing = {
+            record["metadata"]["chunk_id"]: (record, vector)
+            for record, vector in index.items()
+            if "chunk_id" in record["metadata"]
+        }
+
+        current = []
+        changed = []
+        for doc in tag_chunks(documents):
+            chunk_id = doc.metadata["chunk_id"]
+            previous = existing.get(chunk_id)
+            if previous is not None and previous[0]["metadata"].get("content_hash") == doc.metadata["content_hash"]:
+                current.append(previous)
+            else:
+                current.append(None)
+                changed.append((len(current) - 1, doc))
+
+        for (position, doc), vector in zip(changed, self._embed([doc for _, doc in changed], progress)):
+            current[position] = (self._to_record(doc), vector)
+
+        current_ids = {record["metadata"]["chunk_id"] for record, _ in current}
+        keep_sources = set(keep_sources)
+        dropped = [chunk_id for chunk_id in existing if chunk_id not in current_ids]
+        kept = [existing[chunk_id] for chunk_id in dropped if existing[chunk_id][0]["metadata"].get("source") in keep_sources]
+        stale = len(dropped) - len(kept)
+
+        if changed or stale or len(existing) != len(index):
+            rows = current + kept
+            self._check_cancelled(progress)
+            self._publish(collection_name, [vector for _, vector in rows], [record for record, _ in rows])
+        print(f"Incremental index of '{collection_name}': {len(changed)} embedded, "
+              f"{len(current) - len(changed)} unchanged, {stale} deleted")
+        return self.load_vector_store(collection_name)
+
+    async def stream_from_documents(self, documents, collection_name, progress=None, build_id=None):
+        """Rebuild a collection from a document stream; the old index serves until the swap."""
+        rows = []
+        lock = threading.Lock()
+        submitted = 0
+
+        def count(docs):
+            nonlocal submitted
+            for doc in docs:
+                submitted += 1
+                yield doc
+
+        def write_batch(batch, vectors):
+            with lock:
+                rows.extend((self._to_record(doc), vector) for doc, vector in zip(batch, vectors))
+
+        pipeline = IngestionPipeline(self.embeddings, write_batch, progress=progress, stop_on_failure=True)
+        written = await pipeline.run(count(tag_chunks(documents)))
+        # Every submitted chunk must have been embedded, or the live index is kept
+        self._check_rebuild(collection_name, len(rows), submitted)
+        self._check_cancelled(progress)
+        await asyncio.to_thread(
+            self._publish,
+            collection_name,
+            [vector for _, vector in rows],
+            [record for record, _ in rows]
+        )
+        print(f"Streamed {written} chunks into '{collection_name}'")
+        return self.load_vector_store(collection_name)
+
+    def garbage_collect(self, collection_name, keep=config.INDEX_KEEP_VERSIONS):
+        """Drop old generations of a collection, keeping the live one and `keep` predecessors."""
+        self._index(collection_name).garbage_collect(keep)
+
+    def has_index(self, collection_name):
+        return len(self._index(collection_name)) > 0
+
+    def load_vector_store(self, collection_name):
+        """Load an existing vector store."""
+        return LocalVectorSearch(self._index(collection_name), self.embeddings)
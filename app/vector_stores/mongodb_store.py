@@ -1,61 +1,247 @@
+import asyncio
+import re
+import time
 from langchain_mongodb import MongoDBAtlasVectorSearch
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne, DeleteMany, monitoring
+from pymongo.operations import SearchIndexModel
+from utils.helper import tag_chunks
+from utils.tracing import tracer
+from vector_stores.base import BaseVectorStore
+from vector_stores.ingestion import IngestionPipeline
 import config as config
 
-class MongoDBVectorStore:
-    def __init__(self):
-        self.client = MongoClient(config.MONGODB_URI)
-        self.db = self.client[config.MONGODB_DB_NAME]
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model=config.EMBEDDING_MODEL,
-            google_api_key=config.GOOGLE_API_KEY
+class MongoCommandTracer(monitoring.CommandListener):
+    """Record every Mongo command as a span.
+
+    pymongo calls the listener on the thread that ran the command, so the span
+    lands under whatever span was current there (e.g. a retriever call).
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        tracer.record(f"mongo.{event.command_name}", event.duration_micros / 1e6, database=event.database_name)
+
+    def failed(self, event):
+        tracer.record(
+            f"mongo.{event.command_name}",
+            event.duration_micros / 1e6,
+            error=str(event.failure.get("errmsg", event.failure)),
+            database=event.database_name
         )
+
+class MongoDBVectorStore(BaseVectorStore):
+    def __init__(self, embeddings=None):
+        super().__init__(embeddings)
+        self.client = MongoClient(
+            config.MONGODB_URI,
+            event_listeners=[MongoCommandTracer()] if config.TRACING_ENABLED else None
+        )
+        self.db = self.client[config.MONGODB_DB_NAME]
+        # Logical collection name -> live versioned collection
+        self.versions = self.db["index_versions"]
         
-    def create_from_documents(self, documents, collection_name):
-        """Create a vector store from documents."""
-        collection = self.db[collection_name]
-        
-        # Clear existing data
-        collection.delete_many({})
-        
-       # Check for vector search index existence
-        index_name = f"{collection_name}_vector_index"
-        try:
-            # Check if index exists
-            existing_indexes = list(collection.list_indexes())
-            if not any(index["name"] == index_name for index in existing_indexes):
-                print(f"Warning: Vector search index '{index_name}' does not exist. Please create it in MongoDB Atlas with the following JSON:")
-                print("""
-                {
-                "name": "embedding_index",
-                "type": "vectorSearch",
-                "fields": [
-                    {
-                    "type": "vector",
-                    "path": "embedding",
-                    "numDimensions": 768,
-                    "similarity": "cosine"
-                    }
-                ]
-                }
-                """)
-            else:
-                print(f"Vector search index '{index_name}' already exists.")
-        except Exception as e:
-            print(f"Warning: Error checking indexes - {e}")
+    def resolve_collection(self, collection_name):
+        """Return the physical collection currently serving a logical collection.
+
+        Blue/green rebuilds write to versioned collections ("website__v3", or
+        "website__v3_<build_id>" when built for an indexing job) and
+        record the live one in the index_versions collection. Collections that
+        were never rebuilt that way are served under their own name.
+        """
+        pointer = self.versions.find_one({"_id": collection_name})
+        return pointer["collection"] if pointer else collection_name
+
+    def _shadow_collection(self, collection_name, build_id=None):
+        """Pick the next versioned collection name for a rebuild."""
+        pointer = self.versions.find_one({"_id": collection_name}) or {}
+        version = pointer.get("version", 0) + 1
+        # Two builds reading the same pointer must never share (and drop) one collection
+        physical = f"{collection_name}__v{version}" + (f"_{build_id}" if build_id else "")
+        # Leftovers from an earlier failed build under the same name are discarded
+        self.db.drop_collection(physical)
+        return version, physical
 
-        # Create vector store
-        return MongoDBAtlasVectorSearch.from_documents(
+    def _activate(self, collection_name, physical, version, expected_count):
+        """Validate a freshly built collection and atomically make it the live one."""
+        count = self.db[physical].count_documents({})
+        if count != expected_count:
+            raise ValueError(f"'{physical}' has {count} documents, expected {expected_count}")
+        active = self.resolve_collection(collection_name)
+        active_count = self.db[active].estimated_document_count() if active != physical else 0
+        if count < active_count * config.INDEX_MIN_COUNT_RATIO:
+            raise ValueError(
+                f"'{physical}' has {count} documents, under {config.INDEX_MIN_COUNT_RATIO:.0%} "
+                f"of the live '{active}' ({active_count}); keeping the live index"
+            )
+        self._ensure_vector_index(self.db[physical], f"{collection_name}_vector_index")
+        self.versions.update_one(
+            {"_id": collection_name},
+            {"$set": {"collection": physical, "version": version, "count": count, "updated_at": time.time()}},
+            upsert=True
+        )
+        print(f"'{collection_name}' now served from '{physical}' ({count} documents)")
+
+    def garbage_collect(self, collection_name, keep=config.INDEX_KEEP_VERSIONS):
+        """Drop old versions of a collection, keeping the live one and `keep` predecessors."""
+        active = self.resolve_collection(collection_name)
+        pattern = re.compile(rf"^{re.escape(collection_name)}__v(\d+)(?:_\w+)?$")
+        versions = sorted(
+            (int(match.group(1)), name)
+            for name in self.db.list_collection_names()
+            if (match := pattern.match(name))
+        )
+        old = [name for _, name in versions if name != active]
+        # The original unversioned collection is the oldest version once a rebuild went live
+        if active != collection_name and collection_name in self.db.list_collection_names():
+            old.insert(0, collection_name)
+        for name in old[:max(0, len(old) - keep)]:
+            self.db.drop_collection(name)
+            print(f"Dropped old index collection '{name}'")
+
+    def create_from_documents(self, documents, collection_name, build_id=None, progress=None):
+        """Build a new version of a collection from documents and switch to it."""
+        version, physical = self._shadow_collection(collection_name, build_id)
+        documents = list(tag_chunks(documents))
+        MongoDBAtlasVectorSearch.from_documents(
             documents,
             self.embeddings,
-            collection=collection,
-            index_name=index_name
+            collection=self.db[physical],
+            index_name=f"{collection_name}_vector_index"
         )
+        self._check_cancelled(progress)
+        self._activate(collection_name, physical, version, len(documents))
+        return self.load_vector_store(collection_name)
     
+    def _ensure_vector_index(self, collection, index_name):
+        """Create the Atlas vector search index if missing and wait until it is queryable."""
+        try:
+            sample = collection.find_one({}, {"embedding": 1})
+            if not any(index["name"] == index_name for index in collection.list_search_indexes()):
+                if sample is None:
+                    return
+                collection.create_search_index(SearchIndexModel(
+                    definition={"fields": [{
+                        "type": "vector",
+                        "path": "embedding",
+                        "numDimensions": len(sample["embedding"]),
+                        "similarity": "cosine"
+                    }]},
+                    name=index_name,
+                    type="vectorSearch"
+                ))
+            deadline = time.time() + config.INDEX_READY_TIMEOUT
+            while time.time() < deadline:
+                status = next(iter(collection.list_search_indexes(index_name)), {})
+                if status.get("queryable"):
+                    return
+                time.sleep(2)
+            print(f"Warning: vector search index '{index_name}' on '{collection.name}' is not queryable yet")
+        except Exception as e:
+            # Plain MongoDB deployments have no search indexes
+            print(f"Warning: Error checking vector search index - {e}")
+
+    def update_from_documents(self, documents, collection_name, keep_sources=(), progress=None):
+        """Incrementally sync a collection with documents.
+
+        Only chunks that are new or whose content hash changed are embedded;
+        chunks that no longer exist are deleted, except those whose source is
+        listed in keep_sources. The live collection is updated in place and
+        stays queryable throughout.
+        """
+        collection = self.db[self.resolve_collection(collection_name)]
+        collection.create_index("chunk_id")
+
+        existing = {
+            doc["chunk_id"]: doc
+            for doc in collection.find(
+                {"chunk_id": {"$exists": True}},
+                {"_id": 0, "chunk_id": 1, "content_hash": 1, "source": 1}
+            )
+        }
+
+        current_ids = set()
+        changed = []
+        for doc in tag_chunks(documents):
+            chunk_id = doc.metadata["chunk_id"]
+            current_ids.add(chunk_id)
+            if existing.get(chunk_id, {}).get("content_hash") != doc.metadata["content_hash"]:
+                changed.append(doc)
+
+        for start in range(0, len(changed), config.INDEX_BATCH_SIZE):
+            batch = changed[start:start + config.INDEX_BATCH_SIZE]
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in batch])
+            # The live collection is written in place, so a build that lost its job must stop here
+            self._check_cancelled(progress)
+            collection.bulk_write([
+                ReplaceOne({"chunk_id": doc.metadata["chunk_id"]}, self._to_mongo_doc(doc, vector), upsert=True)
+                for doc, vector in zip(batch, vectors)
+            ], ordered=False)
+
+        # Read only now: the document source may add to keep_sources as it runs
+        keep_sources = set(keep_sources)
+        stale = [
+            chunk_id for chunk_id, doc in existing.items()
+            if chunk_id not in current_ids and doc.get("source") not in keep_sources
+        ]
+        deletes = [
+            DeleteMany({"chunk_id": {"$in": stale[start:start + config.INDEX_BATCH_SIZE]}})
+            for start in range(0, len(stale), config.INDEX_BATCH_SIZE)
+        ]
+        # Documents written before chunk IDs existed can't be matched, so drop them
+        deletes.append(DeleteMany({"chunk_id": {"$exists": False}}))
+        self._check_cancelled(progress)
+        collection.bulk_write(deletes, ordered=False)
+
+        print(f"Incremental index of '{collection_name}': {len(changed)} embedded, "
+              f"{len(current_ids) - len(changed)} unchanged, {len(stale)} deleted")
+        return self.load_vector_store(collection_name)
+
+    async def stream_from_documents(self, documents, collection_name, progress=None, build_id=None):
+        """Build a new version of a collection through the ingestion pipeline and switch to it."""
+        version, physical = self._shadow_collection(collection_name, build_id)
+        collection = self.db[physical]
+        submitted = 0
+
+        def count(docs):
+            nonlocal submitted
+            for doc in docs:
+                submitted += 1
+                yield doc
+
+        pipeline = IngestionPipeline(
+            self.embeddings,
+            lambda batch, vectors: self.write_batch(collection, batch, vectors),
+            progress=progress,
+            # A dropped batch fails _activate anyway, so don't keep embedding the rest
+            stop_on_failure=True
+        )
+        written = await pipeline.run(count(tag_chunks(documents)))
+        print(f"Streamed {written} chunks into '{physical}'")
+        # Every submitted chunk must have landed, or the live index is kept
+        self._check_cancelled(progress)
+        await asyncio.to_thread(self._activate, collection_name, physical, version, submitted)
+        return self.load_vector_store(collection_name)
+
+    def write_batch(self, collection, documents, vectors):
+        """Insert one embedded batch."""
+        collection.insert_many(
+            [self._to_mongo_doc(doc, vector) for doc, vector in zip(documents, vectors)],
+            ordered=False
+        )
+
+    @staticmethod
+    def _to_mongo_doc(doc, vector):
+        """Lay out a chunk the way MongoDBAtlasVectorSearch stores it."""
+        return {"text": doc.page_content, "embedding": vector, **doc.metadata}
+
+    def has_index(self, collection_name):
+        return self.db[self.resolve_collection(collection_name)].estimated_document_count() > 0
+
     def load_vector_store(self, collection_name):
         """Load an existing vector store."""
-        collection = self.db[collection_name]
+        collection = self.db[self.resolve_collection(collection_name)]
         index_name = f"{collection_name}_vector_index"
         
         return MongoDBAtlasVectorSearch(
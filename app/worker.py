@@ -0,0 +1,149 @@
+"""Dedicated indexing worker.
+
+Run it from app/ alongside API workers started with INDEX_RUNNER=worker:
+
+    python worker.py
+
+It claims the jobs POST /index queues in MongoDB, crawls and parses the
+sources, writes new index versions and publishes the new index version,
+which every API worker then picks up without restarting. Crawling, parsing
+and embedding happen here, off the processes serving queries. Several
+workers can run for availability, but only one job runs at a time across
+all of them: the others take over if its heartbeat stops.
+"""
+import asyncio
+import os
+import socket
+import config as config
+from pymongo import MongoClient
+from loaders.pdf_loader import CollegePDFLoader
+from loaders.web_loader import CollegeWebsiteLoader
+from utils.index_jobs import COMPLETED, FAILED, IndexJobQueue
+from utils.tracing import configure_logging, tracer
+from vector_stores.ingestion import IndexingProgress, build_indexes
+
+
+def create_vector_store():
+    if config.VECTOR_BACKEND == "local":
+        from vector_stores.local_store import LocalVectorStore
+        return LocalVectorStore()
+    from vector_stores.mongodb_store import MongoDBVectorStore
+    return MongoDBVectorStore()
+
+
+class IndexingWorker:
+    def __init__(self, queue, store, crawler, pdf_reader, worker_id=None):
+        self.queue = queue
+        self.store = store
+        self.crawler = crawler
+        self.pdf_reader = pdf_reader
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        # Heartbeat often enough that a live job is never mistaken for an abandoned one
+        self.heartbeat_interval = max(1.0, min(30.0, queue.stale_after / 4))
+        self.background_jobs = set()
+
+    async def _heartbeat(self, job_id, progress, build):
+        """Keep the job alive; stop its build if another worker has taken it over."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                alive = await asyncio.to_thread(self.queue.heartbeat, job_id, self.worker_id, progress.as_dict())
+            except Exception as e:
+                print(f"Couldn't record heartbeat for job {job_id}: {e}")
+                continue
+            if not alive:
+                print(f"Job {job_id} was taken over by another worker, stopping its build")
+                # The build's thread keeps running after cancel(); this stops its next write
+                progress.cancel()
+                build.cancel()
+                return
+
+    async def _build(self, job_id, progress):
+        await build_indexes(self.crawler, self.pdf_reader, self.store, progress, build_id=job_id)
+        return await asyncio.to_thread(self.queue.publish_version, job_id)
+
+    async def _collect_old_versions(self):
+        """Drop superseded index versions once API workers have had time to switch."""
+        await asyncio.sleep(config.INDEX_GC_DELAY)
+        for collection_name in ("website", "pdfs"):
+            try:
+                await asyncio.to_thread(self.store.garbage_collect, collection_name)
+            except Exception as e:
+                print(f"Couldn't garbage-collect '{collection_name}' versions: {e}")
+
+    async def run_job(self, job):
+        job_id = job["_id"]
+        print(f"Running indexing job {job_id} (attempt {job['attempts']})")
+        progress = IndexingProgress()
+        progress.start()
+        with tracer.span("index_job", job_id=job_id, attempt=job["attempts"]) as span:
+            # Created inside the span so the build's spans are its children
+            build = asyncio.create_task(self._build(job_id, progress))
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, progress, build))
+            try:
+                # wait() rather than await, so a cancelled build doesn't cancel this coroutine
+                await asyncio.wait({build})
+            finally:
+                heartbeat.cancel()
+                if not build.done():
+                    progress.cancel()
+                build.cancel()
+            span.set(abandoned=build.cancelled())
+
+        if build.cancelled():
+            # The job belongs to the worker that took it over; leave its status alone
+            return
+        error = build.exception()
+        if error is not None:
+            print(f"Indexing job {job_id} failed: {error}")
+            progress.finish("failed", str(error))
+            await asyncio.to_thread(
+                self.queue.finish, job_id, self.worker_id, FAILED, progress.as_dict(), str(error)
+            )
+            return
+
+        version = build.result()
+        progress.finish()
+        await asyncio.to_thread(
+            self.queue.finish, job_id, self.worker_id, COMPLETED, progress.as_dict(), version=version
+        )
+        print(f"Indexing job {job_id} completed, published index version {version}")
+        task = asyncio.create_task(self._collect_old_versions())
+        self.background_jobs.add(task)
+        task.add_done_callback(self.background_jobs.discard)
+
+    async def run(self):
+        print(f"Indexing worker {self.worker_id} waiting for jobs")
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            except Exception as e:
+                print(f"Couldn't poll the job queue: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(config.INDEX_JOB_POLL_INTERVAL)
+                continue
+            await self.run_job(job)
+
+
+async def main():
+    queue = IndexJobQueue(MongoClient(config.MONGODB_URI)[config.MONGODB_DB_NAME])
+    store, crawler, pdf_reader = await asyncio.gather(
+        asyncio.to_thread(create_vector_store),
+        asyncio.to_thread(CollegeWebsiteLoader),
+        asyncio.to_thread(CollegePDFLoader),
+    )
+    await IndexingWorker(queue, store, crawler, pdf_reader).run()
+
+
+if __name__ == "__main__":
+    log_listener = configure_logging()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # An interrupted job is retried once its heartbeat goes stale
+        print("Indexing worker stopped")
+    finally:
+        tracer.shutdown()
+        if log_listener:
+            log_listener.stop()
@@ -0,0 +1,277 @@
+"""Offline stand-ins for the benchmark suite: a local website, PDFs, an SQLite
+college database, a deterministic embedding model and a scripted ReAct LLM.
+
+Every fixture embeds known facts so retrieval quality can be scored against
+the labelled queries returned by build_labelled_queries().
+"""
+import asyncio
+import functools
+import math
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+DEPARTMENTS = [
+    "Astrophysics", "Biochemistry", "Ceramics", "Dramaturgy", "Econometrics", "Forestry", "Geodesy",
+    "Hydrology", "Immunology", "Journalism", "Kinesiology", "Linguistics", "Metallurgy", "Neuroscience",
+    "Oceanography", "Pharmacology", "Quantum Optics", "Robotics", "Seismology", "Toxicology",
+    "Urban Planning", "Virology", "Welding", "Xenobiology", "Yacht Design", "Zoology", "Acoustics",
+    "Botany", "Cryptography", "Demography", "Entomology", "Fluid Mechanics", "Genetics", "Horticulture",
+    "Information Theory", "Jurisprudence", "Knowledge Engineering", "Limnology", "Mycology", "Nanotechnology",
+]
+BUILDINGS = ["North Block", "South Block", "Science Tower", "Library Annex", "Innovation Hub"]
+SURNAMES = ["Rao", "Iyer", "Khan", "Mehta", "Das", "Nair", "Singh", "Gupta", "Bose", "Pillai"]
+
+FILLER = (
+    "The college is committed to excellence in teaching and research. Students benefit from "
+    "modern laboratories, an active placement cell and a vibrant campus life. Admissions are "
+    "conducted through a transparent process and scholarships are available for merit students. "
+)
+
+
+def department_facts(seed=7):
+    """One fact record per department: office room, building and head."""
+    rng = random.Random(seed)
+    return [
+        {
+            "slug": f"dept-{index}",
+            "name": name,
+            "room": rng.randint(100, 999),
+            "building": rng.choice(BUILDINGS),
+            "head": f"Professor {rng.choice(SURNAMES)}",
+        }
+        for index, name in enumerate(DEPARTMENTS)
+    ]
+
+
+def course_facts(count=24, seed=11):
+    rng = random.Random(seed)
+    return [
+        {"code": f"CS{100 + index * 7}", "title": f"Advanced Topic {index}", "credits": rng.randint(2, 6)}
+        for index in range(count)
+    ]
+
+
+# --- Website -----------------------------------------------------------------
+
+def build_site(directory, facts, filler_paragraphs=6):
+    """Write an index page plus one linked page per department."""
+    os.makedirs(directory, exist_ok=True)
+    links = "".join(f'<li><a href="/{fact["slug"]}.html?utm_source=nav">{fact["name"]}</a></li>' for fact in facts)
+    with open(os.path.join(directory, "index.html"), "w") as f:
+        f.write(f"<html lang='en'><head><title>College Home</title></head><body><ul>{links}</ul>"
+                f"<p>{FILLER * filler_paragraphs}</p></body></html>")
+    for index, fact in enumerate(facts):
+        neighbours = [facts[(index + step) % len(facts)] for step in (1, 2, 5)]
+        related = "".join(f'<a href="{other["slug"]}.html#top">{other["name"]}</a> ' for other in neighbours)
+        body = (
+            f"<h1>Department of {fact['name']}</h1>"
+            f"<p>{FILLER * (filler_paragraphs // 2)}</p>"
+            f"<p>The {fact['name']} department office is in room {fact['room']} of the {fact['building']}. "
+            f"The head of the {fact['name']} department is {fact['head']}.</p>"
+            f"<p>{FILLER * (filler_paragraphs // 2)}</p>"
+            f"<p>Related: {related}<a href='/index.html'>Home</a></p>"
+        )
+        with open(os.path.join(directory, f"{fact['slug']}.html"), "w") as f:
+            f.write(f"<html lang='en'><head><title>{fact['name']}</title></head><body>{body}</body></html>")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 overflows under a concurrent crawl and costs a 1s SYN retry
+    request_queue_size = 128
+
+
+class LocalSite:
+    """Serve a directory over HTTP on a free localhost port, in a background thread."""
+
+    def __init__(self, directory):
+        handler = functools.partial(_QuietHandler, directory=directory)
+        self.server = _Server(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/index.html"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# --- PDFs --------------------------------------------------------------------
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF; pages is a list of lists of lines."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for lines in pages:
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+        commands.extend(f"({_pdf_escape(line)}) Tj T*" for line in lines)
+        commands.append("ET")
+        stream = "\n".join(commands)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>"
+        )
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def build_pdfs(directory, courses, per_file=4, pages_per_file=3):
+    """Write course handbooks; each course's credits are stated in exactly one file."""
+    os.makedirs(directory, exist_ok=True)
+    filler_lines = [FILLER[i:i + 90] for i in range(0, len(FILLER), 90)] * 6
+    paths = []
+    for start in range(0, len(courses), per_file):
+        pages = []
+        for page in range(pages_per_file):
+            lines = list(filler_lines)
+            for course in courses[start:start + per_file][page::pages_per_file]:
+                lines.append(f"Course {course['code']} ({course['title']}) carries {course['credits']} credits.")
+            lines.extend(filler_lines)
+            pages.append(lines)
+        path = os.path.join(directory, f"handbook-{start // per_file}.pdf")
+        write_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+
+# --- Database ----------------------------------------------------------------
+
+def build_database(path, facts, courses):
+    """SQLite college database with departments, faculty and courses tables."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE departments (id INTEGER PRIMARY KEY, name TEXT, building TEXT, room INTEGER);
+        CREATE TABLE faculty (id INTEGER PRIMARY KEY, name TEXT, department_id INTEGER REFERENCES departments(id));
+        CREATE TABLE courses (code TEXT PRIMARY KEY, title TEXT, credits INTEGER);
+    """)
+    conn.executemany(
+        "INSERT INTO departments VALUES (?, ?, ?, ?)",
+        [(index, fact["name"], fact["building"], fact["room"]) for index, fact in enumerate(facts)]
+    )
+    conn.executemany(
+        "INSERT INTO faculty (name, department_id) VALUES (?, ?)",
+        [(fact["head"], index) for index, fact in enumerate(facts)]
+    )
+    conn.executemany(
+        "INSERT INTO courses VALUES (?, ?, ?)", [(c["code"], c["title"], c["credits"]) for c in courses]
+    )
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+# --- Labelled queries ----------------------------------------------------------
+
+def build_labelled_queries(facts, courses, base_url, pdf_paths, per_file=4):
+    """(collection, query, relevant source) triples for recall@k."""
+    root = base_url.rsplit("/", 1)[0]
+    queries = [
+        ("website", f"Where is the {fact['name']} department office?", f"{root}/{fact['slug']}.html")
+        for fact in facts
+    ]
+    queries.extend(
+        ("pdfs", f"How many credits does course {course['code']} carry?", pdf_paths[index // per_file])
+        for index, course in enumerate(courses)
+    )
+    return queries
+
+
+# --- Models --------------------------------------------------------------------
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings via the hashing trick.
+
+    Similar texts get similar vectors, so retrieval quality is meaningful.
+    latency simulates the network round trip of one API call.
+    """
+
+    def __init__(self, dimensions=384, latency=0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+
+    def _vector(self, text):
+        vector = [0.0] * self.dimensions
+        for token in _TOKEN.findall(text.lower()):
+            digest = zlib.crc32(token.encode())
+            vector[digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class ScriptedReActLLM(BaseChatModel):
+    """Chat model that searches the website once, then answers with the first observation line."""
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "scripted-react"
+
+    def _reply(self, messages):
+        prompt = messages[-1].content
+        question = prompt.split("\n\n", 1)[0]
+        if "Observation:" in prompt:
+            observation = prompt.split("Observation:", 1)[1].strip().splitlines()
+            return f"Thought: I now know the final answer\nFinal Answer: {observation[0] if observation else ''}"
+        return f"Thought: search the website\nAction: website_search\nAction Input: {question}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
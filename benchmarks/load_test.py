@@ -0,0 +1,136 @@
+"""Concurrent /query load test for CollegeBotAgent with mocked LLM and stores.
+
+Runs the real agent (tools, executor, thread pool) against a fake LLM with a
+fixed latency, retrievers that block briefly, and a database whose queries
+block like a real driver. Reports p50/p99 latency per concurrency level and
+checks that every user got the answer to its own question.
+
+Usage (from the repository root):
+    python benchmarks/load_test.py --users 1 10 100 --requests 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.retrievers import BaseRetriever
+
+from agents.bot_agent import CollegeBotAgent
+
+
+class FakeReActLLM(BaseChatModel):
+    """Chat model that calls database_query once and then answers with the question's ID."""
+
+    latency: float = 0.2
+
+    @property
+    def _llm_type(self):
+        return "fake-react"
+
+    def _reply(self, messages):
+        prompt = messages[-1].content
+        question = prompt.split("\n\n", 1)[0]
+        if "Observation:" in prompt:
+            return f"Thought: I now know the final answer\nFinal Answer: answer to {question}"
+        return f"Thought: look it up\nAction: database_query\nAction Input: SELECT * FROM courses -- {question}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+
+class FakeRetriever(BaseRetriever):
+    """Sync-only retriever that blocks like a network vector search."""
+
+    latency: float = 0.02
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        time.sleep(self.latency)
+        return [Document(page_content=f"context for {query}", metadata={"source": "fake"})]
+
+
+class FakeDatabase:
+    """Blocking SQL stand-in."""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+
+    def query_database_guarded(self, query):
+        time.sleep(self.latency)
+        return f"course | query\nCS101 | {query}"
+
+    def query_database_cached(self, query):
+        # Every load-test query is unique, so a cache would never hit; measure the blocking path
+        return self.query_database_guarded(query)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_level(agent, users, requests_per_user):
+    latencies = []
+    mismatches = 0
+
+    async def user(user_id):
+        nonlocal mismatches
+        for n in range(requests_per_user):
+            question = f"q-{user_id}-{n}"
+            start = time.perf_counter()
+            answer = await agent.process_query(question)
+            latencies.append(time.perf_counter() - start)
+            if answer != f"answer to {question}":
+                mismatches += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": len(latencies) / elapsed,
+        "mismatches": mismatches,
+    }
+
+
+async def main(args):
+    logging.getLogger().setLevel(logging.WARNING)
+    agent = CollegeBotAgent(
+        FakeRetriever(latency=args.retriever_latency),
+        FakeRetriever(latency=args.retriever_latency),
+        FakeDatabase(latency=args.db_latency),
+        llm=FakeReActLLM(latency=args.llm_latency),
+    )
+
+    print(f"{'users':>6} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'mismatches':>11}")
+    for users in args.users:
+        result = await run_level(agent, users, args.requests)
+        print(f"{result['users']:>6} {result['requests']:>9} {result['p50_ms']:>9.1f} "
+              f"{result['p99_ms']:>9.1f} {result['throughput_rps']:>8.1f} {result['mismatches']:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=5, help="sequential requests per user")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--retriever-latency", type=float, default=0.02)
+    parser.add_argument("--db-latency", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
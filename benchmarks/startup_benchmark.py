@@ -0,0 +1,172 @@
+"""Cold-start cost of the API: per-module import time, per-component init time and time to ready.
+
+Every measurement runs in a fresh interpreter so nothing is already imported.
+By default the local vector backend is used with an empty index directory, so
+no MongoDB or Gemini calls are made; pass --backend mongodb to include them.
+
+Usage (from the repository root):
+    python benchmarks/startup_benchmark.py --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+MODULES = [
+    "config",
+    "fastapi",
+    "main",
+    "loaders.web_loader",
+    "loaders.pdf_loader",
+    "loaders.db_loader",
+    "vector_stores.local_store",
+    "vector_stores.mongodb_store",
+    "agents.router",
+    "agents.bot_agent",
+]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+INIT_SNIPPET = """
+import json, time
+import main
+timings = {}
+for component in (main.web_loader, main.pdf_loader, *main.STARTUP_COMPONENTS):
+    try:
+        component.get()
+        timings[component.name] = component.init_seconds
+    except Exception as e:
+        timings[component.name] = "failed: %s" % e
+start = time.perf_counter()
+try:
+    main.build_agent()
+    timings["agent"] = time.perf_counter() - start
+except Exception as e:
+    timings["agent"] = "failed: %s" % e
+print(json.dumps(timings))
+"""
+
+
+def run_python(snippet, env):
+    result = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return result.stdout.strip().splitlines()[-1]
+
+
+def measure_imports(env, runs):
+    timings = {}
+    for module in MODULES:
+        samples = [float(run_python(IMPORT_SNIPPET.format(module=module), env)) for _ in range(runs)]
+        timings[module] = statistics.median(samples)
+    return timings
+
+
+def measure_init(env, runs):
+    samples = [json.loads(run_python(INIT_SNIPPET, env)) for _ in range(runs)]
+    timings = {}
+    for name, value in samples[0].items():
+        values = [sample[name] for sample in samples]
+        timings[name] = statistics.median(values) if all(isinstance(v, float) for v in values) else value
+    return timings
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_json(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def measure_server(env, timeout):
+    """Start uvicorn and time the first /health answer and the end of warm-up."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    timings = {"first_health": None, "warmup_done": None, "ready": None}
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if timings["first_health"] is None:
+                    get_json(f"http://127.0.0.1:{port}/health")
+                    timings["first_health"] = time.perf_counter() - start
+                status, body = get_json(f"http://127.0.0.1:{port}/ready")
+                if body["reason"] != "starting":
+                    timings["warmup_done"] = time.perf_counter() - start
+                    timings["ready"] = status == 200
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def print_table(title, timings):
+    print(f"\n{title}")
+    for name, value in timings.items():
+        shown = f"{value * 1000:9.1f} ms" if isinstance(value, float) else f"{value!s:>12}"
+        print(f"  {name:32s}{shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--backend", choices=["local", "mongodb"], default="local")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for the server warm-up")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="startup-benchmark-")
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env["VECTOR_BACKEND"] = args.backend
+    if args.backend == "local":
+        env["LOCAL_INDEX_DIR"] = os.path.join(scratch, "local_index")
+        env["KEYWORD_INDEX_DIR"] = os.path.join(scratch, "keyword_index")
+        env["EMBEDDING_CACHE_PATH"] = ""
+
+    results = {
+        "imports": measure_imports(env, args.runs),
+        "init": measure_init(env, args.runs),
+        "server": measure_server(env, args.timeout),
+    }
+    print_table("Import time (fresh interpreter, includes dependencies)", results["imports"])
+    print_table("Component init time (first use after importing main)", results["init"])
+    print_table("Server start (uvicorn launch to ...)", results["server"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
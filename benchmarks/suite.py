@@ -0,0 +1,271 @@
+"""Offline benchmark suite: crawl, PDF parsing, indexing, retrieval quality/latency, SQL and /query.
+
+Everything runs against local stand-ins from fixtures.py (a localhost website,
+generated PDFs, an SQLite database, hashing embeddings and a scripted ReAct
+LLM) with the local vector backend, so no network, MongoDB or API key is
+needed. Results are compared against a stored baseline; the exit status is 1
+when any metric regressed by more than --tolerance.
+
+Usage (from the repository root):
+    python benchmarks/suite.py                    # run and compare with benchmarks/baseline.json
+    python benchmarks/suite.py --save-baseline    # record the current results as the baseline
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+
+def configure_environment(workdir):
+    """Point the app's settings at scratch locations. Must run before app modules are imported."""
+    os.environ.update({
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "benchmark"),
+        "VECTOR_BACKEND": "local",
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "local_index"),
+        "KEYWORD_INDEX_DIR": os.path.join(workdir, "keyword_index"),
+        "EMBEDDING_CACHE_PATH": "",
+        "INDEX_MODE": "streaming",
+        "ROUTER_ENABLED": "false",
+        "RESPONSE_CACHE_ENABLED": "false",
+        "QUERY_LOG_SINK": "none",
+        "TRACE_EXPORT_PATH": "",
+    })
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class Results:
+    """Collects one sample per metric per round and keeps the best.
+
+    On a shared or single-core machine one slow round is mostly noise, and
+    best-of-N is far more stable between runs than a single sample.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, higher_is_better):
+        print(f"  {name:28s}{value:12.3f} {unit}")
+        previous = self.metrics.get(name)
+        if previous is not None:
+            best = max if higher_is_better else min
+            value = best(value, previous["value"])
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "higher_is_better": higher_is_better}
+
+    def report(self):
+        print("\nBest of all rounds:")
+        for name, metric in self.metrics.items():
+            print(f"  {name:28s}{metric['value']:12.3f} {metric['unit']}")
+
+
+def bench_crawl(results, site_url, max_pages):
+    from loaders.web_loader import CollegeWebsiteLoader
+
+    loader = CollegeWebsiteLoader(base_url=site_url)
+    start = time.perf_counter()
+    chunks = asyncio.run(loader.crawl_website_async(max_pages=max_pages, rate_limit=0))
+    elapsed = time.perf_counter() - start
+    pages = len({chunk.metadata["source"] for chunk in chunks})
+    results.add("crawl_pages_per_s", pages / elapsed, "pages/s", True)
+    return chunks
+
+
+def bench_pdfs(results, pdf_dir, workers):
+    from loaders.pdf_loader import CollegePDFLoader
+
+    loader = CollegePDFLoader(pdf_dir, manifest_path=os.path.join(pdf_dir, ".manifest.json"))
+    start = time.perf_counter()
+    chunks = list(loader.load_pdfs_parallel(max_workers=workers))
+    elapsed = time.perf_counter() - start
+    results.add("pdf_chunks_per_s", len(chunks) / elapsed, "chunks/s", True)
+    return chunks
+
+
+def bench_indexing(results, store, web_chunks, pdf_chunks):
+    start = time.perf_counter()
+    asyncio.run(store.aindex_documents(web_chunks, "website"))
+    asyncio.run(store.aindex_documents(pdf_chunks, "pdfs"))
+    elapsed = time.perf_counter() - start
+    results.add("index_chunks_per_s", (len(web_chunks) + len(pdf_chunks)) / elapsed, "chunks/s", True)
+
+
+def bench_retrieval(results, store, labelled_queries, k):
+    retrievers = {name: store.get_retriever(name) for name in ("website", "pdfs")}
+    latencies, hits = [], 0
+    for collection, query, relevant in labelled_queries:
+        start = time.perf_counter()
+        documents = retrievers[collection].invoke(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += relevant in [document.metadata.get("source") for document in documents[:k]]
+    results.add("retrieval_p50_ms", percentile(latencies, 50), "ms", False)
+    results.add("retrieval_p99_ms", percentile(latencies, 99), "ms", False)
+    results.add(f"recall_at_{k}", hits / len(labelled_queries), "fraction", True)
+    return retrievers
+
+
+def bench_sql(results, db, runs):
+    query = (
+        "SELECT d.name, d.building, d.room, f.name FROM departments d "
+        "JOIN faculty f ON f.department_id = d.id ORDER BY d.name"
+    )
+    for name, run in (("sql_p50_ms", db.query_database_guarded), ("sql_cached_p50_ms", db.query_database_cached)):
+        latencies = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            run(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results.add(name, percentile(latencies, 50), "ms", False)
+
+
+async def _query_load(app, questions, concurrency):
+    import httpx
+
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def one(question):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/query", json={"text": question})
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(question) for question in questions))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def bench_query(results, store, retrievers, db, labelled_queries, requests, concurrency, llm_latency):
+    from agents.bot_agent import CollegeBotAgent
+    from agents.schema_index import SchemaIndex
+    from fixtures import ScriptedReActLLM
+    import main
+
+    main.college_bot_agent = CollegeBotAgent(
+        retrievers["website"], retrievers["pdfs"], db,
+        llm=ScriptedReActLLM(latency=llm_latency), schema_index=SchemaIndex(db, store.embeddings)
+    )
+    questions = [labelled_queries[i % len(labelled_queries)][1] for i in range(requests)]
+    latencies, errors, elapsed = asyncio.run(_query_load(main.app, questions, concurrency))
+    results.add("query_p50_ms", percentile(latencies, 50), "ms", False)
+    results.add("query_p99_ms", percentile(latencies, 99), "ms", False)
+    results.add("query_requests_per_s", requests / elapsed, "req/s", True)
+    if errors:
+        print(f"  warning: {errors} /query requests failed")
+
+
+def compare(metrics, baseline, tolerance):
+    """Print metric changes against the baseline and return the names that regressed."""
+    regressions = []
+    print(f"\n{'metric':28s}{'current':>12s}{'baseline':>12s}{'change':>9s}")
+    for name, metric in metrics.items():
+        previous = baseline.get(name)
+        if previous is None or not previous["value"]:
+            print(f"{name:28s}{metric['value']:12.3f}{'-':>12s}{'new':>9s}")
+            continue
+        change = (metric["value"] - previous["value"]) / previous["value"]
+        worse = -change if metric["higher_is_better"] else change
+        status = "  REGRESSED" if worse > tolerance else ""
+        if status:
+            regressions.append(name)
+        print(f"{name:28s}{metric['value']:12.3f}{previous['value']:12.3f}{change:+9.1%}{status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before failing")
+    parser.add_argument("--rounds", type=int, default=3, help="repeat every benchmark and keep the best result")
+    parser.add_argument("--pdf-workers", type=int, default=2)
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="simulated seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    parser.add_argument("--requests", type=int, default=60, help="/query requests")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent /query requests")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="college-bot-bench-")
+    configure_environment(workdir)
+    # Per-request INFO logs from the app and httpx would swamp the report
+    logging.disable(logging.INFO)
+
+    import config
+    import fixtures
+    import main as app_main  # noqa: F401 - imported up front so no round pays for it
+    from loaders.db_loader import CollegeDatabaseLoader
+    from loaders.pdf_loader import CollegePDFLoader  # noqa: F401
+    from loaders.web_loader import CollegeWebsiteLoader  # noqa: F401
+    from vector_stores.embedding_cache import CachedEmbeddings
+    from vector_stores.local_store import LocalVectorStore
+
+    facts = fixtures.department_facts()
+    courses = fixtures.course_facts()
+    fixtures.build_site(os.path.join(workdir, "site"), facts)
+    pdf_paths = fixtures.build_pdfs(os.path.join(workdir, "pdfs"), courses)
+    db = CollegeDatabaseLoader(fixtures.build_database(os.path.join(workdir, "college.db"), facts, courses))
+
+    results = Results()
+    print(f"Workspace: {workdir}")
+    with fixtures.LocalSite(os.path.join(workdir, "site")) as site:
+        labelled = fixtures.build_labelled_queries(facts, courses, site.url, pdf_paths)
+        for round_number in range(1, args.rounds + 1):
+            print(f"Round {round_number}/{args.rounds}")
+            # A fresh index and embedding cache per round, so every round indexes from scratch
+            store = LocalVectorStore(
+                embeddings=CachedEmbeddings(fixtures.HashingEmbeddings(latency=args.embed_latency), "hashing"),
+                index_dir=os.path.join(workdir, "local_index", str(round_number)),
+            )
+            web_chunks = bench_crawl(results, site.url, max_pages=len(facts) + 1)
+            pdf_chunks = bench_pdfs(results, os.path.join(workdir, "pdfs"), args.pdf_workers)
+            bench_indexing(results, store, web_chunks, pdf_chunks)
+            retrievers = bench_retrieval(results, store, labelled, config.RETRIEVER_K)
+            bench_sql(results, db, runs=50)
+            bench_query(results, store, retrievers, db, labelled, args.requests, args.concurrency, args.llm_latency)
+    results.report()
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "environment": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpus": os.cpu_count(),
+                },
+                "settings": {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline")},
+                "metrics": results.metrics,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results.metrics, baseline["metrics"], args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine, text
+from loaders.db_loader import CollegeDatabaseLoader
+
+ACCEPTED = [
+    "SELECT name, load FROM faculty",
+    "SELECT MAX(load) FROM faculty",
+    "SELECT `update`, `set` FROM faculty",
+    'SELECT "delete" FROM faculty',
+    "SELECT REPLACE(name, 'Dr. ', '') FROM faculty",
+    "SELECT * FROM events WHERE title = 'DROP TABLE faculty; DELETE FROM courses'",
+    "SELECT * FROM events WHERE title = 'it''s -- not a comment'",
+    "SELECT name FROM faculty -- delete this later\n",
+    "SELECT name /* update */ FROM faculty;",
+    "SELECT SUBSTRING(name FROM 1 FOR 3) FROM faculty",
+    "WITH busy AS (SELECT * FROM faculty WHERE load > 3) SELECT name FROM busy",
+    "select count(*) from courses where department = 'Physics'",
+    "SHOW TABLES",
+    "DESCRIBE faculty",
+    "EXPLAIN SELECT * FROM courses",
+]
+
+REJECTED = [
+    "",
+    " ; ",
+    "DELETE FROM faculty",
+    "UPDATE faculty SET load = 0",
+    "INSERT INTO courses VALUES (1)",
+    "SET @x = 1",
+    "/* SELECT */ DELETE FROM faculty",
+    "-- SELECT\nDROP TABLE faculty",
+    "SELECT 1; DROP TABLE faculty",
+    "SELECT '--'; DROP TABLE faculty",
+    "SELECT * FROM faculty INTO OUTFILE '/tmp/faculty.csv'",
+    "SELECT * INTO DUMPFILE '/tmp/faculty' FROM faculty",
+    "SELECT name INTO @name FROM faculty LIMIT 1",
+    "SELECT * INTO faculty_copy FROM faculty",
+    "SELECT * FROM faculty /*! INTO OUTFILE '/tmp/faculty.csv' */",
+    "SELECT * FROM faculty FOR UPDATE",
+    "SELECT * FROM faculty FOR SHARE",
+    "SELECT * FROM faculty FOR NO KEY UPDATE",
+    "SELECT * FROM faculty LOCK IN SHARE MODE",
+    "WITH gone AS (DELETE FROM faculty RETURNING *) SELECT * FROM gone",
+    "WITH ids AS (SELECT id FROM faculty) UPDATE faculty SET load = 0",
+    "EXPLAIN ANALYZE DELETE FROM faculty",
+    "EXPLAIN (ANALYZE, FORMAT JSON) UPDATE faculty SET load = 0",
+]
+
+
+@pytest.mark.parametrize("query", ACCEPTED)
+def test_check_read_only_accepts(query):
+    CollegeDatabaseLoader.check_read_only(query)
+
+
+@pytest.mark.parametrize("query", REJECTED)
+def test_check_read_only_rejects(query):
+    with pytest.raises(ValueError):
+        CollegeDatabaseLoader.check_read_only(query)
+
+
+@pytest.fixture
+def loader(tmp_path):
+    url = f"sqlite:///{tmp_path / 'college.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE faculty (name TEXT, load INTEGER)"))
+        conn.execute(text("INSERT INTO faculty VALUES ('Ada', 3), ('Alan', 5)"))
+    engine.dispose()
+    return CollegeDatabaseLoader(url, cache_results=False)
+
+
+def test_guarded_query_runs_columns_named_like_keywords(loader):
+    assert loader.query_database_guarded("SELECT name, load FROM faculty ORDER BY name") == (
+        "name | load\nAda | 3\nAlan | 5"
+    )
+
+
+def test_guarded_query_rejects_writes(loader):
+    assert loader.query_database_guarded("SELECT 1; DELETE FROM faculty").startswith("Query rejected:")
+    assert loader.query_database_guarded("SELECT COUNT(*) FROM faculty") == "COUNT(*)\n2"